@@ -15,26 +15,41 @@ import numpy as np
 cimport numpy as cnp
 
 
-cdef cnp.ndarray[cnp.uint8_t, ndim=1] \
-    _make_filter_array_general(arr,
+ctypedef fused value_t:
+    cnp.float64_t
+    cnp.float32_t
+    cnp.int64_t
+    cnp.int32_t
+    cnp.uint64_t
+    cnp.uint32_t
+
+ctypedef fused index_t:
+    cnp.int32_t
+    cnp.int64_t
+
+
+def _make_filter_array_general(value_t[:] data,
+                               index_t[:] indptr,
+                               index_t[:] indices,
+                               Py_ssize_t n,
                                ids,
                                metadata,
                                func,
-                               axis,
                                cnp.uint8_t invert):
     """Faster version of
     [func(vals_i, id_i, md_i) ^ invert for
     (vals_i, id_i, md_i) in zip(ids, metadata, rows/cols)]
     """
     cdef:
-        Py_ssize_t i, j, n = arr.shape[::-1][axis]
-        cnp.ndarray[cnp.float64_t, ndim=1] data = arr.data, \
-                                           row_or_col = np.zeros(n)
-        cnp.ndarray[cnp.int32_t, ndim=1] indptr = arr.indptr, \
-                                         indices = arr.indices
-        cnp.ndarray[cnp.uint8_t, ndim=1] bools = \
-            np.empty(len(ids), dtype=np.uint8)
-        cnp.int32_t start, end
+        Py_ssize_t i, j
+        index_t start, end
+        cnp.float64_t[:] row_or_col_view
+        cnp.uint8_t[:] bools_view
+
+    row_or_col = np.zeros(n)
+    bools = np.empty(len(ids), dtype=np.uint8)
+    row_or_col_view = row_or_col
+    bools_view = bools
 
     for i in range(len(ids)):
         start, end = indptr[i], indptr[i+1]
@@ -44,27 +59,32 @@ cdef cnp.ndarray[cnp.uint8_t, ndim=1] \
         # row_or_col.put(indices[start:end], data[start:end])
         for j in range(n):
             if start >= end or j < indices[start]:
-                row_or_col[j] = 0
+                row_or_col_view[j] = 0
             elif j == indices[start]:
-                row_or_col[j] = data[start]
+                row_or_col_view[j] = data[start]
                 start += 1
 
         # After converting the output of the filtering function to a
         # bool, we XOR it with invert (if invert is false it doesn't
         # modify the function output, if it's true it inverts it).
-        bools[i] = bool(func(row_or_col, ids[i], metadata[i])) ^ invert
+        bools_view[i] = bool(func(row_or_col, ids[i], metadata[i])) ^ invert
 
     return bools
 
-cdef _remove_rows_csr(arr, cnp.ndarray[cnp.uint8_t, ndim=1] booleans):
-    """Sparse equivalent of arr[booleans] for a dense array.
+
+def _compact_rows(value_t[:] data,
+                  index_t[:] indptr,
+                  index_t[:] indices,
+                  cnp.uint8_t[:] booleans):
+    """Move the retained rows of a CSR matrix to the start of its arrays
+
+    Returns the number of values retained
     """
-    cdef Py_ssize_t m, n, row, j, offset, offset_rows, nnz
-    cdef cnp.int32_t start, end
-    cdef cnp.ndarray[cnp.int32_t, ndim=1] indptr = arr.indptr
-    cdef cnp.ndarray[cnp.int32_t, ndim=1] indices = arr.indices
-    cdef cnp.ndarray[cnp.float64_t, ndim=1] data = arr.data
-    m, n = arr.shape
+    cdef:
+        Py_ssize_t m, row, j, offset, offset_rows
+        index_t start, end, nnz
+
+    m = indptr.shape[0] - 1
     offset_rows = 0
     offset = 0
     nnz = 0
@@ -80,10 +100,19 @@ cdef _remove_rows_csr(arr, cnp.ndarray[cnp.uint8_t, ndim=1] booleans):
         else:
             offset += end - start
             offset_rows += 1
-    arr.data = data[:nnz]
-    arr.indices = indices[:nnz]
-    arr.indptr = indptr[:m-offset_rows+1]
-    arr._shape = (m - offset_rows, n)
+    return nnz
+
+
+def _remove_rows_csr(arr, booleans):
+    """Sparse equivalent of arr[booleans] for a dense array.
+    """
+    m, n = arr.shape
+    nnz = _compact_rows(arr.data, arr.indptr, arr.indices, booleans)
+    n_rows = int(np.count_nonzero(booleans))
+    arr.data = arr.data[:nnz]
+    arr.indices = arr.indices[:nnz]
+    arr.indptr = arr.indptr[:n_rows+1]
+    arr._shape = (n_rows, n)
 
 def _filter(arr, ids, metadata, index, ids_to_keep, axis, invert):
     """Filter row/columns of a sparse matrix according to the output of a
@@ -93,8 +122,8 @@ def _filter(arr, ids, metadata, index, ids_to_keep, axis, invert):
     ----------
     arr : sparse matrix
     ids : 1D array_like
-    metadata : 1D array_like
-    index : dict
+    metadata : tuple or ColumnarMetadata
+    index : _IDIndex
         Maps id to index
     ids_to_keep : function or iterable
     axis : int
@@ -104,7 +133,9 @@ def _filter(arr, ids, metadata, index, ids_to_keep, axis, invert):
     -------
     arr : sparse matrix
     ids : 1D ndarray of dtype object
-    metadata : tuple
+    metadata : tuple or ColumnarMetadata
+    keep : 1D ndarray of dtype bool
+        Which of `ids` were retained
     """
     invert = bool(invert)
     metadata_is_None = metadata is None
@@ -117,19 +148,22 @@ def _filter(arr, ids, metadata, index, ids_to_keep, axis, invert):
         arr = arr.tocsc()
     fmt = arr.getformat()
 
-    cdef cnp.ndarray[cnp.uint8_t, ndim=1] bools
-
     if metadata_is_None:
         metadata = (None,) * len(ids)
 
     if isinstance(ids_to_keep, Iterable):
-        idx = [index[id_] for id_ in ids_to_keep]
+        if not isinstance(ids_to_keep, np.ndarray):
+            ids_to_keep = list(ids_to_keep)
+        idx = index.positions(ids_to_keep)
+        if (idx < 0).any():
+            raise KeyError(ids_to_keep[np.flatnonzero(idx < 0)[0]])
         ids_to_keep = np.zeros(len(ids), dtype=bool)
         ids_to_keep.put(idx, True)
         bools = np.bitwise_xor(ids_to_keep, invert).view(np.uint8)
     elif isinstance(ids_to_keep, FunctionType):
-        bools = _make_filter_array_general(arr, ids, metadata, ids_to_keep,
-                                           axis, invert)
+        bools = _make_filter_array_general(arr.data, arr.indptr, arr.indices,
+                                           arr.shape[::-1][axis], ids,
+                                           metadata, ids_to_keep, invert)
     else:
         raise TypeError("ids_to_keep must be an iterable or a function")
 
@@ -140,10 +174,14 @@ def _filter(arr, ids, metadata, index, ids_to_keep, axis, invert):
         _remove_rows_csr(arr, bools)
         arr = arr.T  # Back to CSC
 
-    ids_dtype = ids.dtype
-    ids = np.asarray(list(compress(ids, bools)), dtype=ids_dtype)
-    metadata = tuple(compress(metadata, bools))
+    keep = bools.view(bool)
+    ids = ids[keep]
+    if isinstance(metadata, tuple):
+        metadata = tuple(compress(metadata, bools))
+    else:
+        # columnar metadata are selected in bulk
+        metadata = metadata.take(keep)
 
     if metadata_is_None:
         metadata = None
-    return arr, ids, metadata
+    return arr, ids, metadata, keep
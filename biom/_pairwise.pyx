@@ -0,0 +1,71 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2011-2017, The BIOM Format Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+
+
+import numpy as np
+cimport numpy as cnp
+
+
+ctypedef fused index_t:
+    cnp.int32_t
+    cnp.int64_t
+
+
+def _sum_of_minimums_vectors(cnp.float64_t[:] a_data, index_t[:] a_indices,
+                             index_t[:] a_indptr, cnp.float64_t[:] b_data,
+                             index_t[:] b_indices, index_t[:] b_indptr,
+                             cnp.float64_t[:, :] out,
+                             cnp.float64_t[:] buffer):
+    """Sum the elementwise minimums of every pair of rows of two matrices"""
+    cdef:
+        Py_ssize_t i, j
+        index_t k
+        cnp.float64_t total, value
+
+    with nogil:
+        for i in range(a_indptr.shape[0] - 1):
+            for k in range(a_indptr[i], a_indptr[i + 1]):
+                buffer[a_indices[k]] = a_data[k]
+
+            for j in range(b_indptr.shape[0] - 1):
+                total = 0
+                for k in range(b_indptr[j], b_indptr[j + 1]):
+                    value = buffer[b_indices[k]]
+                    total += value if value < b_data[k] else b_data[k]
+                out[i, j] = total
+
+            for k in range(a_indptr[i], a_indptr[i + 1]):
+                buffer[a_indices[k]] = 0
+
+
+def _sum_of_minimums(a, b):
+    """Sum the elementwise minimums of every pair of rows of a and b
+
+    Parameters
+    ----------
+    a : csr_matrix
+        A canonical float64 matrix of non-negative values
+    b : csr_matrix
+        A canonical float64 matrix of non-negative values, with the same
+        number of columns and index type as `a`
+
+    Returns
+    -------
+    np.ndarray
+        The sums, of shape ``(a.shape[0], b.shape[0])``
+
+    Notes
+    -----
+    Each row of `a` is scattered into a dense buffer once, against which the
+    nonzero values of every row of `b` are compared, so the cost is bound by
+    the number of rows of `a` times the number of nonzero values of `b`.
+    """
+    out = np.zeros((a.shape[0], b.shape[0]))
+    _sum_of_minimums_vectors(a.data, a.indices, a.indptr, b.data, b.indices,
+                             b.indptr, out, np.zeros(a.shape[1]))
+    return out
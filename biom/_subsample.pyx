@@ -11,16 +11,50 @@ import numpy as np
 cimport numpy as cnp
 
 
-def _subsample(arr, n, with_replacement):
+# numpy's "marginals" multivariate hypergeometric sampler loses precision once
+# the population reaches this size
+cdef cnp.int64_t MAX_HYPERGEOMETRIC = 1000000000
+
+
+cdef _subsample_without_replacement(cnp.ndarray[cnp.int64_t, ndim=1] counts,
+                                    cnp.int64_t counts_sum,
+                                    cnp.int64_t n,
+                                    rng):
+    """Draw n items without replacement from a vector of category counts
+
+    The draw is a multivariate hypergeometric variate, so memory is bound by
+    the number of categories and not by the number of items in the vector.
+    """
+    cdef:
+        cnp.ndarray[cnp.int64_t, ndim=1] picked, bounds
+
+    if counts_sum < MAX_HYPERGEOMETRIC:
+        return rng.multivariate_hypergeometric(counts, n)
+
+    # the population is too large for the hypergeometric sampler, so pick
+    # item positions directly (Floyd's algorithm in numpy, O(n) memory) and
+    # map each position back to the category which contains it
+    picked = rng.choice(counts_sum, n, replace=False, shuffle=False)
+    bounds = np.cumsum(counts)
+    return np.bincount(np.searchsorted(bounds, picked, side='right'),
+                       minlength=counts.shape[0])
+
+
+def _subsample(arr, n, with_replacement, rng):
     """Subsample non-zero values of a sparse array
 
     Parameters
     ----------
     arr : {csr_matrix, csc_matrix}
-        A 1xM sparse vector
+        A 1xM sparse vector, of any numeric type
     n : int
         Number of items to subsample from `arr`
-    
+    with_replacement : bool
+        If `True`, draw from a multinomial distribution. Otherwise draw from
+        a multivariate hypergeometric distribution.
+    rng : numpy.random.Generator
+        The source of randomness
+
     Returns
     -------
     ndarray
@@ -31,36 +65,39 @@ def _subsample(arr, n, with_replacement):
     This code was adapted from scikit-bio (`skbio.math._subsample`)
 
     """
+    _subsample_vectors(arr.indptr, arr.data, n, with_replacement, rng)
+
+
+ctypedef fused index_t:
+    cnp.int32_t
+    cnp.int64_t
+
+
+def _subsample_vectors(index_t[:] indptr, data, n, with_replacement,
+                       rng):
+    """Subsample each vector of a compressed matrix, in place"""
     cdef:
         cnp.int64_t counts_sum
-        cnp.ndarray[cnp.float64_t, ndim=1] data = arr.data
-        cnp.ndarray[cnp.int32_t, ndim=1] data_i = arr.data.astype(np.int32)
-        cnp.ndarray[cnp.float64_t, ndim=1] result
-        cnp.ndarray[cnp.int32_t, ndim=1] indices = arr.indices
-        cnp.ndarray[cnp.int32_t, ndim=1] indptr = arr.indptr
-        cnp.ndarray[cnp.int32_t, ndim=1] permuted, unpacked, r
-        cnp.float64_t cnt
-        Py_ssize_t i, j, length
+        cnp.ndarray[cnp.int64_t, ndim=1] data_i = data.astype(np.int64)
+        Py_ssize_t i, start, end
 
     for i in range(indptr.shape[0] - 1):
         start, end = indptr[i], indptr[i+1]
-        length = end - start
-        counts_sum = data[start:end].sum()
-        
+        if start == end:
+            continue
+
+        counts_sum = data_i[start:end].sum()
+        if counts_sum == 0:
+            continue
+
         if with_replacement:
-            pvals = data[start:end] / counts_sum
-            data[start:end] = np.random.multinomial(n, pvals)
+            pvals = data[start:end] / data[start:end].sum()
+            data[start:end] = rng.multinomial(n, pvals)
         else:
             if counts_sum < n:
                 data[start:end] = 0
                 continue
 
-            r = np.arange(length, dtype=np.int32)
-            unpacked = np.repeat(r, data_i[start:end])
-            permuted = np.random.permutation(unpacked)[:n]
-
-            result = np.zeros(length, dtype=np.float64)
-            for idx in range(permuted.shape[0]):
-                result[permuted[idx]] += 1
-
-            data[start:end] = result
\ No newline at end of file
+            data[start:end] = _subsample_without_replacement(data_i[start:end],
+                                                             counts_sum, n,
+                                                             rng)
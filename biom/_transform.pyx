@@ -11,6 +11,25 @@ import numpy as np
 cimport numpy as cnp
 
 
+ctypedef fused index_t:
+    cnp.int32_t
+    cnp.int64_t
+
+
+def _transform_vectors(index_t[:] indptr, data, ids, metadata,
+                       function):
+    """Apply function to the values of each vector of a compressed matrix"""
+    cdef:
+        Py_ssize_t row_or_col
+        index_t start, end
+
+    for row_or_col in range(indptr.shape[0] - 1):
+        start, end = indptr[row_or_col], indptr[row_or_col+1]
+        id_ = ids[row_or_col]
+        md = metadata[row_or_col]
+        data[start:end] = function(data[start:end], id_, md)
+
+
 def _transform(arr, ids, metadata, function, axis):
     """Transform non-zero values of a sparse array, in place.
 
@@ -21,7 +40,8 @@ def _transform(arr, ids, metadata, function, axis):
     ----------
     arr : csr_matrix or csc_matrix
         Matrix whose rows or columns (respectively) are to be
-        transformed.
+        transformed. The values may be of any numeric type, and are
+        assigned the transformed values in place.
     ids : 1D array_like
         ids along the given axis.
     metadata : 1D array_like or None
@@ -33,18 +53,8 @@ def _transform(arr, ids, metadata, function, axis):
     axis : int
         Transform rows of `arr` if 0, columns if 1.
     """
-    cdef:
-        Py_ssize_t n, row_or_col
-        cnp.ndarray[cnp.int32_t, ndim=1] indptr = arr.indptr
-        cnp.ndarray[cnp.float64_t, ndim=1] data = arr.data
-        cdef cnp.int32_t start, end
-
     if metadata is None:
         metadata = (None,) * len(ids)
 
-    n = arr.shape[axis]
-    for row_or_col in range(n):
-        start, end = indptr[row_or_col], indptr[row_or_col+1]
-        id_ = ids[row_or_col]
-        md = metadata[row_or_col]
-        data[start:end] = function(data[start:end], id_, md)
+    _transform_vectors(arr.indptr[:arr.shape[axis] + 1], arr.data, ids,
+                       metadata, function)
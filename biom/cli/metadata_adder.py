@@ -162,12 +162,13 @@ def _add_metadata(table, sample_metadata=None, observation_metadata=None,
 
     # parse mapping files
     if sample_metadata is not None:
-        sample_metadata = MetadataMap.from_file(sample_metadata,
-                                                process_fns=process_fns,
-                                                header=sample_header)
+        sample_metadata = MetadataMap.dataframe_from_file(
+            sample_metadata,
+            process_fns=process_fns,
+            header=sample_header)
 
     if observation_metadata is not None:
-        observation_metadata = MetadataMap.from_file(
+        observation_metadata = MetadataMap.dataframe_from_file(
             observation_metadata,
             process_fns=process_fns,
             header=observation_header)
@@ -176,10 +177,10 @@ def _add_metadata(table, sample_metadata=None, observation_metadata=None,
     # RETURNING IT! MetadataAdder is angry!
 
     # add metadata as necessary
-    if sample_metadata:
+    if sample_metadata is not None:
         table.add_metadata(sample_metadata, axis='sample')
 
-    if observation_metadata:
+    if observation_metadata is not None:
         table.add_metadata(observation_metadata, axis='observation')
 
     return table
@@ -33,7 +33,7 @@ def export_metadata(input_fp, sample_metadata_fp, observation_metadata_fp):
       --sample-metadata-fp sample.tsv
       --observation-metadata-fp observation.tsv
     """
-    table = load_table(input_fp)
+    table = load_table(input_fp, components={'ids', 'metadata'})
 
     if sample_metadata_fp:
         _export_metadata(table, 'sample', input_fp, sample_metadata_fp)
@@ -0,0 +1,40 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2011-2017, The BIOM Format Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+# ----------------------------------------------------------------------------
+
+
+import click
+
+from biom.cli import cli
+from biom.parse import concat_to_hdf5, generatedby
+
+
+@cli.command(name='concat-tables')
+@click.option('-i', '--input-fps', required=True, multiple=True,
+              type=click.Path(exists=True, dir_okay=False),
+              help='An input BIOM table, may be specified multiple times')
+@click.option('-o', '--output-fp', required=True,
+              type=click.Path(writable=True),
+              help='The output HDF5 BIOM table')
+@click.option('--buffer-size', default=None, type=int,
+              help='The number of matrix elements to hold in memory while '
+                   'writing the observation oriented matrix. Defaults to the '
+                   'number of nonzero values in the largest input table.')
+def concat_tables(input_fps, output_fp, buffer_size):
+    """Concatenate the samples of many BIOM tables.
+
+    The sample IDs of the input tables must be disjoint. Only one input table
+    is held in memory at a time, and the output is written as HDF5.
+
+    Example usage:
+
+    Concatenate three tables:
+
+    $ biom concat-tables -i a.biom -i b.biom -i c.biom -o abc.biom
+    """
+    concat_to_hdf5(input_fps, output_fp, generatedby(),
+                   buffer_size=buffer_size)
@@ -11,6 +11,8 @@ import click
 
 from biom import load_table
 from biom.cli import cli
+from biom.table import Table
+from biom.util import HAVE_H5PY, biom_open, is_hdf5_file
 
 
 @cli.command()
@@ -36,7 +38,14 @@ def head(input_fp, output_fp, n_obs, n_samp):
     $ biom head -i table.biom
 
     """
-    table = load_table(input_fp).head(n=n_obs, m=n_samp)
+    if HAVE_H5PY and is_hdf5_file(input_fp):
+        # only read the corner of the table from the file
+        with biom_open(input_fp) as f:
+            table = Table.from_hdf5(f, obs_slice=slice(0, max(n_obs, 0)),
+                                    samp_slice=slice(0, max(n_samp, 0)))
+    else:
+        table = load_table(input_fp)
+    table = table.head(n=n_obs, m=n_samp)
 
     if output_fp is None:
         click.echo(str(table))
@@ -33,6 +33,6 @@ def summarize_table(input_fp, observations):
 
     $ biom table-ids -i table.biom --observations
     """
-    tab = load_table(input_fp)
+    tab = load_table(input_fp, components={'ids'})
     for id_ in tab.ids(axis='observation' if observations else 'sample'):
         click.echo(id_)
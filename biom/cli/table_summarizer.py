@@ -7,15 +7,15 @@
 # -----------------------------------------------------------------------------
 
 
-from operator import itemgetter
 import locale
 
 import click
-from numpy import std
+import numpy as np
 
 from biom import load_table
 from biom.cli import cli
-from biom.util import compute_counts_per_sample_stats
+from biom.table import Table
+from biom.util import HAVE_H5PY, biom_open, is_hdf5_file
 
 
 @cli.command(name='summarize-table')
@@ -44,8 +44,13 @@ def summarize_table(input_fp, output_fp, qualitative, observations):
     $ biom summarize-table -i table.biom -o table_summary.txt
 
     """
-    table = load_table(input_fp)
-    result = _summarize_table(table, qualitative, observations)
+    if HAVE_H5PY and is_hdf5_file(input_fp):
+        # the matrix is streamed rather than loaded
+        with biom_open(input_fp) as f:
+            result = _summarize_hdf5(f, qualitative, observations)
+    else:
+        table = load_table(input_fp)
+        result = _summarize_table(table, qualitative, observations)
     if output_fp:
         with open(output_fp, 'w') as fh:
             fh.write(result)
@@ -53,49 +58,96 @@ def summarize_table(input_fp, output_fp, qualitative, observations):
         click.echo(result)
 
 
-def _summarize_table(table, qualitative=False, observations=False):
-    lines = []
-    locale.setlocale(locale.LC_ALL, '')
+def _metadata_keys(table, axis):
+    """The metadata categories of the first ID of an axis"""
+    if table.metadata(axis=axis) is None:
+        return ["None provided"]
+    return list(table.metadata(axis=axis)[0].keys())
 
-    if observations:
-        table = table.transpose()
 
-    min_counts, max_counts, median_counts, mean_counts, counts_per_samp =\
-        compute_counts_per_sample_stats(table, qualitative)
-    num_observations = len(table.ids(axis='observation'))
+def _summarize_table(table, qualitative=False, observations=False):
+    axis = 'observation' if observations else 'sample'
+    if qualitative:
+        counts = table.nonzero_counts(axis, binary=True)
+    else:
+        counts = table.sum(axis=axis).astype(float)
 
-    counts_per_sample_values = list(counts_per_samp.values())
+    return _format_summary(table.ids(axis=axis), counts,
+                           len(table.ids()),
+                           len(table.ids(axis='observation')),
+                           table.get_table_density(),
+                           _metadata_keys(table, 'sample'),
+                           _metadata_keys(table, 'observation'),
+                           qualitative, observations)
 
-    if table.metadata() is None:
-        sample_md_keys = ["None provided"]
-    else:
-        sample_md_keys = table.metadata()[0].keys()
 
-    if table.metadata(axis='observation') is None:
-        observation_md_keys = ["None provided"]
-    else:
-        observation_md_keys = table.metadata(axis='observation')[0].keys()
+def _summarize_hdf5(h5grp, qualitative=False, observations=False,
+                    buffer_size=10000000):
+    """Summarize an HDF5 table without loading its matrix
 
-    num_samples = len(table.ids())
+    The compressed matrix of the summarized axis is read `buffer_size`
+    elements at a time, so the memory used is bound by the number of IDs.
+    """
+    axis = 'observation' if observations else 'sample'
+    ids = Table.from_hdf5(h5grp, components={'ids'})
+    # only the metadata of the first ID of each axis are needed for the
+    # categories
+    corner = Table.from_hdf5(h5grp, obs_slice=slice(0, 1),
+                             samp_slice=slice(0, 1),
+                             components={'ids', 'metadata'})
+
+    matrix = h5grp[axis]['matrix']
+    indptr = matrix['indptr'][:]
+    data = matrix['data']
+    n_ids = len(indptr) - 1
+
+    sums = np.zeros(n_ids)
+    nonzero = np.zeros(n_ids, dtype=np.int64)
+    for start in range(0, int(indptr[-1]), buffer_size):
+        block = data[start:start + buffer_size]
+        owners = np.searchsorted(indptr,
+                                 np.arange(start, start + len(block)),
+                                 side='right') - 1
+        sums += np.bincount(owners, weights=block, minlength=n_ids)
+        nonzero += np.bincount(owners[block != 0], minlength=n_ids)
+
+    n_samples = len(ids.ids())
+    n_observations = len(ids.ids(axis='observation'))
+    density = 0.0
+    if n_samples and n_observations:
+        density = nonzero.sum() / (n_samples * n_observations)
+
+    return _format_summary(ids.ids(axis=axis),
+                           nonzero if qualitative else sums,
+                           n_samples, n_observations, density,
+                           _metadata_keys(corner, 'sample'),
+                           _metadata_keys(corner, 'observation'),
+                           qualitative, observations)
+
+
+def _format_summary(ids, counts, num_samples, num_observations, density,
+                    sample_md_keys, observation_md_keys, qualitative,
+                    observations):
+    lines = []
+    locale.setlocale(locale.LC_ALL, '')
 
-    if observations:
-        # as this is a transpose of the original table...
-        lines.append('Num samples: ' + locale.format('%d', num_observations,
-                                                     grouping=True))
-        lines.append('Num observations: ' + locale.format('%d', num_samples,
-                                                          grouping=True))
+    if len(counts):
+        min_counts, max_counts = counts.min(), counts.max()
+        median_counts, mean_counts = np.median(counts), counts.mean()
     else:
-        lines.append('Num samples: ' + locale.format('%d', num_samples,
-                                                     grouping=True))
-        lines.append('Num observations: ' + locale.format('%d',
-                     num_observations, grouping=True))
+        min_counts = max_counts = median_counts = mean_counts = 0
+
+    lines.append('Num samples: ' + locale.format('%d', num_samples,
+                                                 grouping=True))
+    lines.append('Num observations: ' + locale.format('%d', num_observations,
+                                                      grouping=True))
 
     if not qualitative:
-        total_count = sum(counts_per_sample_values)
+        total_count = counts.sum()
         lines.append('Total count: ' + locale.format('%d', total_count,
                                                      grouping=True))
         lines.append('Table density (fraction of non-zero values): %1.3f' %
-                     table.get_table_density())
+                     density)
 
     lines.append('')
 
@@ -114,32 +166,26 @@ def _summarize_table(table, qualitative=False, observations=False):
     lines.append(' Mean: ' + locale.format('%1.3f', mean_counts,
                                            grouping=True))
     lines.append(' Std. dev.: ' + locale.format('%1.3f',
-                 std(counts_per_sample_values), grouping=True))
-
-    if observations:
-        # since this is a transpose...
-        lines.append(
-            ' Sample Metadata Categories: %s' %
-            '; '.join(observation_md_keys))
-        lines.append(
-            ' Observation Metadata Categories: %s' %
-            '; '.join(sample_md_keys))
-        lines.append('')
-    else:
-        lines.append(
-            ' Sample Metadata Categories: %s' %
-            '; '.join(sample_md_keys))
-        lines.append(
-            ' Observation Metadata Categories: %s' %
-            '; '.join(observation_md_keys))
-        lines.append('')
+                 np.std(counts), grouping=True))
+
+    lines.append(
+        ' Sample Metadata Categories: %s' %
+        '; '.join(sample_md_keys))
+    lines.append(
+        ' Observation Metadata Categories: %s' %
+        '; '.join(observation_md_keys))
+    lines.append('')
 
     if qualitative:
         lines.append('Observations/sample detail:')
     else:
         lines.append('Counts/sample detail:')
 
-    for k, v in sorted(counts_per_samp.items(), key=itemgetter(1)):
-        lines.append('%s: ' % k + locale.format('%1.3f', v, grouping=True))
+    # counts are often shared by many IDs, so each distinct count is
+    # formatted once
+    values, inverse = np.unique(counts, return_inverse=True)
+    formatted = [locale.format('%1.3f', v, grouping=True) for v in values]
+    for i in np.argsort(counts, kind='stable'):
+        lines.append('%s: %s' % (ids[i], formatted[inverse[i]]))
 
     return "\n".join(lines)
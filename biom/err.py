@@ -31,6 +31,19 @@ sampmdsize : 'raise'
     Treatment of a table in which the number of sample metadata elements
     differs from the size of the data.
 
+The validation level determines which of these tests are performed:
+
+full (default)
+    All tests are performed.
+
+structural
+    Only the tests which take constant time are performed, which compare the
+    sizes of the IDs and metadata to the size of the data. Duplicate IDs are
+    not tested for.
+
+none
+    No tests are performed.
+
 Examples
 --------
 
@@ -48,6 +61,12 @@ Traceback (most recent call last):
 TableException: Empty table!
 >>> _ = seterr(**old_state)
 
+Use `errstate` to skip the more expensive tests for a block of code:
+
+>>> from biom.err import errstate
+>>> with errstate(validation='structural'):
+...     _ = example_table.filter(make_empty_f, inplace=False)
+
 """
 
 # -----------------------------------------------------------------------------
@@ -62,6 +81,8 @@ from warnings import warn
 from sys import stdout
 from contextlib import contextmanager
 
+import numpy as np
+
 from biom.exception import TableException
 
 
@@ -74,6 +95,9 @@ SAMPDUP = "Duplicate sample IDs!"
 OBSMDSIZE = "Size of observation metadata differs from matrix size!"
 SAMPMDSIZE = "Size of sample metadata differs from matrix size!"
 
+# validation levels, in increasing order of the tests performed
+VALIDATION_LEVELS = ('none', 'structural', 'full')
+
 
 # _zz_ so the sort order places this test last
 def _zz_test_empty(t):
@@ -91,14 +115,41 @@ def _test_sampsize(t):
     return t.shape[1] != len(t.ids(axis='sample'))
 
 
+def _has_duplicates(ids, index):
+    """Check if there are duplicate IDs
+
+    If the ID index of the table is already built, such as when it was
+    derived from that of another table, the permutation which sorts it is
+    reused, so the IDs are not sorted again. As the IDs may have been
+    modified since they were indexed, they are only trusted to be sorted once
+    checked.
+    """
+    if index is not None and index._sorter is not None and \
+            len(index) == len(ids):
+        ordered = ids[index._sorter]
+        try:
+            if (ordered[1:] >= ordered[:-1]).all():
+                return bool((ordered[1:] == ordered[:-1]).any())
+        except TypeError:
+            pass
+
+    try:
+        return len(np.unique(ids)) != len(ids)
+    except TypeError:
+        # IDs of an object array may not be orderable
+        return len(set(ids)) != len(ids)
+
+
 def _test_obsdup(t):
     """Check if there are duplicate observations"""
-    return t.shape[0] != len(set(t.ids(axis='observation')))
+    return _has_duplicates(t.ids(axis='observation'),
+                           getattr(t, '_obs_index', None))
 
 
 def _test_sampdup(t):
     """Check if there are duplicate samples"""
-    return t.shape[1] != len(set(t.ids(axis='sample')))
+    return _has_duplicates(t.ids(axis='sample'),
+                           getattr(t, '_sample_index', None))
 
 
 def _test_obsmdsize(t):
@@ -135,9 +186,12 @@ class ErrorProfile:
         self._profile = {}
         self._state = {}
         self._test = {}
+        self._level = {}
+        self._order = []
+        self._validation = 'full'
 
     def register(self, errtype, msg, state, test, callback=None,
-                 exception=Exception):
+                 exception=Exception, level='full'):
         """Register an error type
 
         Paramters
@@ -154,6 +208,9 @@ class ErrorProfile:
             A callback function for use with state 'call'
         exception : Exception, optional
             An exception to throw in state 'raises'.
+        level : {'structural', 'full'}, optional
+            The lowest validation level at which the error is tested for.
+            Defaults to 'full'.
 
         Raises
         ------
@@ -161,6 +218,8 @@ class ErrorProfile:
             If the errtype already exists
         KeyError
             If the state is invalid
+        KeyError
+            If the level is invalid
 
         """
         if errtype in self:
@@ -169,9 +228,14 @@ class ErrorProfile:
         if state not in self._valid_states:
             raise KeyError("Unknown state: %s" % state)
 
+        if level not in VALIDATION_LEVELS[1:]:
+            raise KeyError("Unknown level: %s" % level)
+
         self._profile[errtype] = _create_error_states(msg, callback, exception)
         self._state[errtype] = state
         self._test[errtype] = test
+        self._level[errtype] = VALIDATION_LEVELS.index(level)
+        self._order = sorted(self._test)
 
     def unregister(self, errtype):
         """Unregister an error type
@@ -202,6 +266,8 @@ class ErrorProfile:
         prof = self._profile.pop(errtype)
         func = self._test.pop(errtype)
         state = self._state.pop(errtype)
+        self._level.pop(errtype)
+        self._order = sorted(self._test)
 
         return (prof, func, state)
 
@@ -226,6 +292,18 @@ class ErrorProfile:
 
             self._state[errtype] = new_state
 
+    @property
+    def validation(self):
+        """Return the current validation level"""
+        return self._validation
+
+    @validation.setter
+    def validation(self, level):
+        """Update the current validation level"""
+        if level not in VALIDATION_LEVELS:
+            raise KeyError("Unknown validation level: %s" % level)
+        self._validation = level
+
     def __contains__(self, errtype):
         """Check if an error type exists"""
         return errtype in self._state
@@ -241,6 +319,10 @@ class ErrorProfile:
             Error types to check, if not provided, all known error types are
             checked.
 
+        Notes
+        -----
+        Error types above the current validation level are not tested for.
+
         Examples
         --------
         >>> from biom import example_table
@@ -248,11 +330,20 @@ class ErrorProfile:
         >>> __errprof.test(example_table, 'empty')
 
         """
+        level = VALIDATION_LEVELS.index(self._validation)
+        if not level:
+            return
+
         if not args:
-            args = self._test.keys()
+            args = self._order
+        elif len(args) > 1:
+            args = sorted(args)
+
+        for errtype in args:
+            if self._level.get(errtype, level) > level:
+                continue
 
-        for errtype in sorted(args):
-            test = self._test.get(errtype, lambda: None)
+            test = self._test.get(errtype, lambda item: None)
 
             if test(item):
                 return self._handle_error(errtype, item)
@@ -321,19 +412,19 @@ class ErrorProfile:
 
 __errprof = ErrorProfile()
 __errprof.register('empty', EMPTY, 'ignore', _zz_test_empty,
-                   exception=TableException)
+                   exception=TableException, level='structural')
 __errprof.register('obssize', OBSSIZE, 'raise', _test_obssize,
-                   exception=TableException)
+                   exception=TableException, level='structural')
 __errprof.register('sampsize', SAMPSIZE, 'raise', _test_sampsize,
-                   exception=TableException)
+                   exception=TableException, level='structural')
 __errprof.register('obsdup', OBSDUP, 'raise', _test_obsdup,
                    exception=TableException)
 __errprof.register('sampdup', SAMPDUP, 'raise', _test_sampdup,
                    exception=TableException)
 __errprof.register('obsmdsize', OBSMDSIZE, 'raise', _test_obsmdsize,
-                   exception=TableException)
+                   exception=TableException, level='structural')
 __errprof.register('sampmdsize', SAMPMDSIZE, 'raise', _test_sampmdsize,
-                   exception=TableException)
+                   exception=TableException, level='structural')
 
 
 def geterr():
@@ -355,10 +446,19 @@ def seterr(**kwargs):
         - call: Call a function specified using the `seterrcall` function.
         - print: Print a warning directly to ``stdout``.
 
+    validation : {'full', 'structural', 'none'}, optional
+        Set which tests are performed
+
+        - full: Perform all tests.
+        - structural: Skip the tests for duplicate IDs, which scale with the
+          number of IDs.
+        - none: Perform no tests.
+
     Returns
     -------
     old_settings: dict
-        Dictionary containing the old settings
+        Dictionary containing the old settings, including the old validation
+        level if a validation level was set
 
     See also
     --------
@@ -384,6 +484,11 @@ def seterr(**kwargs):
 
     """
     old_state = __errprof.state.copy()
+    kwargs = kwargs.copy()
+    if 'validation' in kwargs:
+        old_state['validation'] = __errprof.validation
+        __errprof.validation = kwargs.pop('validation')
+
     if 'all' in kwargs:
         __errprof.state = {'all': kwargs['all']}
     else:
@@ -491,7 +596,8 @@ def errstate(**kwargs):
     kwargs : {empty}
         Keyword arguments. The valid error types that are defined. Each keyword
         should have a string or callable for the particular error. Values are:
-        {'ignore', 'warn', 'raise', 'call', 'print'}
+        {'ignore', 'warn', 'raise', 'call', 'print'}. The keyword validation
+        sets the validation level, one of {'full', 'structural', 'none'}.
 
     See Also
     --------
@@ -499,5 +605,7 @@ def errstate(**kwargs):
 
     """
     old_state = seterr(**kwargs)
-    yield
-    seterr(**old_state)
+    try:
+        yield
+    finally:
+        seterr(**old_state)
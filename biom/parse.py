@@ -9,15 +9,23 @@
 # ----------------------------------------------------------------------------
 
 
+import csv
 import numpy as np
+import pandas as pd
 import io
+import os
+import re
 import h5py
+from scipy.sparse import csc_matrix, csr_matrix
 
-from biom.exception import BiomParseException, UnknownAxisError
-from biom.table import Table
+from biom.exception import (BiomParseException, DisjointIDError,
+                            UnknownAxisError)
+from biom.table import Table, _id_positions, _resolve_components
 from biom.util import biom_open, __version__
 import json
 from collections import defaultdict, OrderedDict
+from itertools import chain
+from tempfile import TemporaryDirectory
 
 
 __author__ = "Justin Kuczynski"
@@ -342,7 +350,64 @@ def parse_uc(fh):
     return Table(data, observation_ids=observation_ids, sample_ids=sample_ids)
 
 
-def parse_biom_table(file_obj, ids=None, axis='sample', input_is_dense=False):
+def _json_without_data(biom_str):
+    """Cut the matrix data out of a JSON BIOM string
+
+    The data are a list of lists of numbers, so their span ends at the first
+    pair of closing brackets, and is found without scanning it character by
+    character.
+
+    Returns
+    -------
+    str or None
+        The string with empty data, or None if the data cannot be located
+    """
+    key = re.search(r'"data"\s*:\s*\[', biom_str)
+    if key is None:
+        return None
+
+    end = (re.compile(r'\s*\]').match(biom_str, key.end()) or
+           re.compile(r'\]\s*\]').search(biom_str, key.end()))
+    if end is None:
+        return None
+    return biom_str[:key.end()] + ']' + biom_str[end.end():]
+
+
+def _load_json_table(biom_str, components):
+    """Load a JSON BIOM string, skipping the parts not in components"""
+    if isinstance(biom_str, bytes):
+        biom_str = biom_str.decode('utf8')
+
+    json_table = None
+    if 'data' not in components:
+        stripped = _json_without_data(biom_str)
+        if stripped is not None:
+            try:
+                json_table = json.loads(stripped,
+                                        object_pairs_hook=OrderedDict)
+            except ValueError:
+                pass
+
+        # "data" could also be a metadata category, in which case the string
+        # no longer parses or the matrix is still present
+        if json_table is not None and json_table.get('data') != []:
+            json_table = None
+
+    if json_table is None:
+        json_table = json.loads(biom_str, object_pairs_hook=OrderedDict)
+
+    if 'data' not in components:
+        json_table['data'] = []
+        json_table['matrix_type'] = 'sparse'
+
+    if 'metadata' not in components:
+        for entry in chain(json_table['rows'], json_table['columns']):
+            entry['metadata'] = None
+    return json_table
+
+
+def parse_biom_table(file_obj, ids=None, axis='sample', input_is_dense=False,
+                     components=None):
     r"""Parses the biom table stored in `file_obj`
 
     Parameters
@@ -358,6 +423,10 @@ def parse_biom_table(file_obj, ids=None, axis='sample', input_is_dense=False):
     input_is_dense : boolean
         Indicates if the BIOM table is dense or sparse. Valid only for JSON
         tables.
+    components : iterable of {'ids', 'metadata', 'data'}, optional
+        The parts of the table to load. IDs are always loaded. Without
+        'data', the matrix is not parsed and the table has no nonzero values.
+        Defaults to all of them.
 
     Returns
     -------
@@ -368,11 +437,16 @@ def parse_biom_table(file_obj, ids=None, axis='sample', input_is_dense=False):
     ------
     ValueError
         If `samples` and `observations` are provided.
+        If a component is not known, or if `ids` are given without the
+        'data' component
 
     Notes
     -----
     Subsetting from the BIOM table is only supported in one axis
 
+    Components are only skipped when parsing HDF5 and JSON tables, the
+    matrix of a TSV table being its content.
+
     Examples
     --------
     Parse a hdf5 biom table
@@ -392,8 +466,13 @@ def parse_biom_table(file_obj, ids=None, axis='sample', input_is_dense=False):
     if axis not in ['observation', 'sample']:
         UnknownAxisError(axis)
 
+    components = _resolve_components(components)
+    if 'data' not in components and ids is not None:
+        raise ValueError("Subsetting by ids requires the data")
+
     try:
-        return Table.from_hdf5(file_obj, ids=ids, axis=axis)
+        return Table.from_hdf5(file_obj, ids=ids, axis=axis,
+                               components=components)
     except ValueError:
         pass
     except RuntimeError:
@@ -407,22 +486,21 @@ def parse_biom_table(file_obj, ids=None, axis='sample', input_is_dense=False):
             c = file_obj.read(1)
         if c == '{':
             file_obj.seek(old_pos)
-            t = Table.from_json(json.load(file_obj,
-                                          object_pairs_hook=OrderedDict),
+            t = Table.from_json(_load_json_table(file_obj.read(),
+                                                 components),
                                 input_is_dense=input_is_dense)
         else:
             file_obj.seek(old_pos)
             t = Table.from_tsv(file_obj, None, None, lambda x: x)
     elif isinstance(file_obj, list):
         try:
-            t = Table.from_json(json.loads(''.join(file_obj),
-                                           object_pairs_hook=OrderedDict),
+            t = Table.from_json(_load_json_table(''.join(file_obj),
+                                                 components),
                                 input_is_dense=input_is_dense)
         except ValueError:
             t = Table.from_tsv(file_obj, None, None, lambda x: x)
     else:
-        t = Table.from_json(json.loads(file_obj,
-                                       object_pairs_hook=OrderedDict),
+        t = Table.from_json(_load_json_table(file_obj, components),
                             input_is_dense=input_is_dense)
 
     def subset_ids(data, id_, md):
@@ -449,6 +527,97 @@ def sc_pipe_separated(x):
     return complex_metadata
 
 
+def _parse_mapping_fields(lines, strip_quotes=True, suppress_stripping=False,
+                          header=None):
+    """Split the lines of a mapping file into fields
+
+    Returns
+    -------
+    np.ndarray
+        The ID of each line
+    dict of {str: pd.Series}
+        The fields of each category, as strings. Fields missing from a line
+        are empty strings.
+    """
+    if hasattr(lines, "upper"):
+        # Try opening if a string was passed
+        try:
+            lines = open(lines)
+        except OSError:
+            raise BiomParseException("A string was passed that doesn't "
+                                     "refer to an accessible filepath.")
+
+    if strip_quotes:
+        if suppress_stripping:
+            def strip_f(x):
+                # remove quotes but not spaces
+                return x.replace('"', '')
+        else:
+            def strip_f(x):
+                # remove quotes and spaces
+                return x.replace('"', '').strip()
+    else:
+        if suppress_stripping:
+            def strip_f(x):
+                # don't remove quotes or spaces
+                return x
+        else:
+            def strip_f(x):
+                # remove spaces but not quotes
+                return x.strip()
+
+    header = header or []
+    data = []
+    for line in lines:
+        line = strip_f(line)
+        if not line or (suppress_stripping and not line.strip()):
+            # skip blank lines when not stripping lines
+            continue
+
+        if line.startswith('#'):
+            # the first comment is the header unless one was provided
+            if not header:
+                header = line[1:].strip().split('\t')
+        else:
+            data.append(line)
+
+    if not header:
+        raise BiomParseException("No header line was found in mapping "
+                                 "file.")
+    if not data:
+        raise BiomParseException("No data found in mapping file.")
+
+    # short lines are padded with empty fields
+    n_fields = max(len(header), max(line.count('\t') for line in data) + 1)
+    if suppress_stripping:
+        fields = pd.DataFrame([list(map(strip_f, line.split('\t')))
+                               for line in data],
+                              columns=range(n_fields)).fillna('')
+    else:
+        text = '\n'.join(data)
+        fields = pd.read_csv(io.StringIO(text), sep='\t', header=None,
+                             names=range(n_fields), dtype=str,
+                             na_filter=False, quoting=csv.QUOTE_NONE,
+                             skip_blank_lines=False)
+
+        # quotes and the spaces around each line were already removed, so
+        # only fields next to a tab can hold spaces to strip
+        if re.search(r'[^\S\t\n]\t|\t[^\S\t\n]', text):
+            fields = fields.apply(lambda column: column.str.strip())
+
+    ids = fields[0].to_numpy()
+    if not fields[0].is_unique:
+        raise BiomParseException("First column values are not unique! "
+                                 "Cannot be ids.")
+
+    # as with a dict, a repeated category takes the last column
+    positions = {}
+    for position, category in enumerate(header[1:], 1):
+        positions[category] = position
+    return ids, {category: fields[position]
+                 for category, position in positions.items()}
+
+
 class MetadataMap(dict):
 
     @classmethod
@@ -476,85 +645,81 @@ class MetadataMap(dict):
         to port it to the BIOM Format project (and keep it under BIOM's BSD
         license).
         """
-        if hasattr(lines, "upper"):
-            # Try opening if a string was passed
-            try:
-                lines = open(lines)
-            except OSError:
-                raise BiomParseException("A string was passed that doesn't "
-                                         "refer to an accessible filepath.")
-
-        if strip_quotes:
-            if suppress_stripping:
-                def strip_f(x):
-                    # remove quotes but not spaces
-                    return x.replace('"', '')
-            else:
-                def strip_f(x):
-                    # remove quotes and spaces
-                    return x.replace('"', '').strip()
-        else:
-            if suppress_stripping:
-                def strip_f(x):
-                    # don't remove quotes or spaces
-                    return x
-            else:
-                def strip_f(x):
-                    # remove spaces but not quotes
-                    return x.strip()
-
         # if the user didn't provide process functions, initialize as
         # an empty dict
         if process_fns is None:
             process_fns = {}
 
-        # Create lists to store the results
-        mapping_data = []
-        header = header or []
-        comments = []
+        ids, fields = _parse_mapping_fields(lines, strip_quotes,
+                                            suppress_stripping, header)
+        columns = {}
+        for category, values in fields.items():
+            if category in process_fns:
+                values = values.map(process_fns[category])
+            columns[category] = values.tolist()
 
-        # Begin iterating over lines
-        for line in lines:
-            line = strip_f(line)
-            if not line or (suppress_stripping and not line.strip()):
-                # skip blank lines when not stripping lines
-                continue
+        categories = list(columns)
+        return cls({id_: dict(zip(categories, row))
+                    for id_, row in zip(ids, zip(*columns.values()))}
+                   if categories else {id_: {} for id_ in ids})
 
-            if line.startswith('#'):
-                line = line[1:]
-                if not header:
-                    header = line.strip().split('\t')
-                else:
-                    comments.append(line)
-            else:
-                # Will add empty string to empty fields
-                tmp_line = list(map(strip_f, line.split('\t')))
-                if len(tmp_line) < len(header):
-                    tmp_line.extend([''] * (len(header) - len(tmp_line)))
-                mapping_data.append(tmp_line)
-
-        if not header:
-            raise BiomParseException("No header line was found in mapping "
-                                     "file.")
-        if not mapping_data:
-            raise BiomParseException("No data found in mapping file.")
-
-        first_col = [i[0] for i in mapping_data]
-        if len(first_col) != len(set(first_col)):
-            raise BiomParseException("First column values are not unique! "
-                                     "Cannot be ids.")
-
-        mapping = {}
-        for vals in mapping_data:
-            current_d = {}
-            for k, v in zip(header[1:], vals[1:]):
-                try:
-                    current_d[k] = process_fns[k](v)
-                except KeyError:
-                    current_d[k] = v
-            mapping[vals[0]] = current_d
+    @classmethod
+    def dataframe_from_file(cls, lines, strip_quotes=True,
+                            suppress_stripping=False, header=None,
+                            process_fns=None):
+        """Parse a mapping file into a DataFrame
+
+        The metadata are parsed as by ``MetadataMap.from_file``, but are not
+        expanded into a dict per ID, which makes this the faster route to
+        ``Table.add_metadata``.
+
+        Parameters
+        ----------
+        lines : str or iterable of str
+            The path to the mapping file, or its lines
+        strip_quotes : bool, optional
+            Remove double quotes from the fields. Defaults to True.
+        suppress_stripping : bool, optional
+            Retain the whitespace around the fields. Defaults to False.
+        header : list of str, optional
+            The name of each column, overriding the header line of the file.
+            Columns beyond the header are ignored.
+        process_fns : dict of {str: callable}, optional
+            A function to apply to the values of a category. It is applied
+            once per distinct value, so the result, such as a list, may be
+            shared by IDs. ``Table.add_metadata`` gives each ID its own copy
+            of a list.
+
+        Returns
+        -------
+        pd.DataFrame
+            The metadata, indexed by ID with a column per category
+
+        Raises
+        ------
+        BiomParseException
+            If there is no header or no data, or if the IDs are not unique
 
-        return cls(mapping)
+        See Also
+        --------
+        MetadataMap.from_file
+        """
+        if process_fns is None:
+            process_fns = {}
+
+        ids, fields = _parse_mapping_fields(lines, strip_quotes,
+                                            suppress_stripping, header)
+        columns = {}
+        for category, values in fields.items():
+            if category in process_fns:
+                codes, uniques = pd.factorize(values)
+                mapped = np.empty(len(uniques), dtype=object)
+                for i, value in enumerate(uniques):
+                    mapped[i] = process_fns[category](value)
+                values = pd.Series(mapped[codes]).infer_objects()
+            columns[category] = values.to_numpy()
+        return pd.DataFrame(columns, index=pd.Index(ids, dtype=object),
+                            columns=list(columns))
 
     def __init__(self, mapping):
         """Accepts dictionary mapping IDs to metadata.
@@ -631,13 +796,17 @@ def convert_biom_to_table(biom_f, header_key=None, header_value=None,
         return table.delimited_self()
 
 
-def load_table(f):
+def load_table(f, components=None):
     r"""Load a `Table` from a path
 
     Parameters
     ----------
     f : str or file-like object
         The entity to parse
+    components : iterable of {'ids', 'metadata', 'data'}, optional
+        The parts of the table to load. IDs are always loaded. Without
+        'data', the matrix of an HDF5 or JSON table is not parsed and the
+        table has no nonzero values. Defaults to all of them.
 
     Returns
     -------
@@ -659,16 +828,308 @@ def load_table(f):
     >>> from biom import load_table
     >>> table = load_table('path/to/table.biom') # doctest: +SKIP
 
+    Load only the IDs and metadata of a table, without its matrix:
+
+    >>> table = load_table('path/to/table.biom',
+    ...                    components={'ids', 'metadata'}) # doctest: +SKIP
+
     """
     if isinstance(f, (io.IOBase, h5py.File)):
         try:
-            table = parse_biom_table(f)
+            table = parse_biom_table(f, components=components)
         except (IndexError, TypeError):
             raise TypeError("%s does not appear to be a BIOM file!" % f)
     else:
         with biom_open(f) as fp:
             try:
-                table = parse_biom_table(fp)
+                table = parse_biom_table(fp, components=components)
             except (IndexError, TypeError):
                 raise TypeError("%s does not appear to be a BIOM file!" % f)
     return table
+
+
+def _load_ids(fp):
+    """Load only the observation and sample IDs of a BIOM table
+
+    Parameters
+    ----------
+    fp : str
+        The path to the table
+
+    Returns
+    -------
+    np.ndarray
+        The observation IDs
+    np.ndarray
+        The sample IDs
+    """
+    if h5py.is_hdf5(fp):
+        ids = []
+        with h5py.File(fp, 'r') as f:
+            for axis in ('observation', 'sample'):
+                ids.append(np.array([i.decode('utf8')
+                                     if isinstance(i, bytes) else i
+                                     for i in f[axis]['ids'][:]],
+                                    dtype=object))
+        return tuple(ids)
+    else:
+        table = load_table(fp, components={'ids'})
+        return table.ids(axis='observation'), table.ids()
+
+
+def _hdf5_csc_to_csr(csc_grp, csr_grp, n_rows, buffer_size, compression):
+    """Transpose an HDF5 CSC matrix into CSR without loading it in memory
+
+    Parameters
+    ----------
+    csc_grp : h5py.Group
+        The group containing the data, indices and indptr of the CSC matrix
+    csr_grp : h5py.Group
+        The group to write the data, indices and indptr of the CSR matrix to
+    n_rows : int
+        The number of rows of the matrix
+    buffer_size : int
+        The number of matrix elements to hold in memory at a time
+    compression : str or None
+        The compression of the CSR datasets
+
+    Notes
+    -----
+    The rows are grouped into buckets of consecutive rows whose elements fit
+    in `buffer_size`. The CSC matrix is read twice: once to count the
+    elements of each row, which locates each bucket in the CSR matrix, and
+    once to copy each element into its bucket, along with its row in a
+    temporary file. Each bucket is then ordered by row in memory.
+    """
+    col_indptr = csc_grp['indptr'][:].astype(np.int64)
+    nnz = int(col_indptr[-1])
+    src_indices = csc_grp['indices']
+    src_data = csc_grp['data']
+
+    # the length of each row
+    counts = np.zeros(n_rows, dtype=np.int64)
+    for start in range(0, nnz, buffer_size):
+        counts += np.bincount(src_indices[start:start + buffer_size],
+                              minlength=n_rows)
+    row_indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(counts, out=row_indptr[1:])
+
+    # the first row of each bucket, each taking as many rows as fit in the
+    # buffer, and at least one
+    bounds = [0]
+    while bounds[-1] < n_rows:
+        row_start = bounds[-1]
+        row_end = np.searchsorted(row_indptr,
+                                  row_indptr[row_start] + buffer_size,
+                                  side='right') - 1
+        bounds.append(min(max(row_end, row_start + 1), n_rows))
+    bounds = np.asarray(bounds)
+    bucket_of_row = np.repeat(np.arange(len(bounds) - 1), np.diff(bounds))
+    fill = row_indptr[bounds[:-1]].copy()
+
+    dst_data = csr_grp.create_dataset('data', shape=(nnz,), dtype=np.float64,
+                                      compression=compression)
+    dst_indices = csr_grp.create_dataset('indices', shape=(nnz,),
+                                         dtype=np.int32,
+                                         compression=compression)
+
+    with TemporaryDirectory() as scratch:
+        dst_rows = np.memmap(os.path.join(scratch, 'rows'), dtype=np.int64,
+                             mode='w+', shape=(max(nnz, 1),))
+
+        for start in range(0, nnz, buffer_size):
+            rows = src_indices[start:start + buffer_size].astype(np.int64)
+            positions = np.arange(start, start + len(rows))
+            cols = np.searchsorted(col_indptr, positions, side='right') - 1
+            values = src_data[start:start + buffer_size]
+
+            # the CSC matrix is read in column order, and a stable sort keeps
+            # that order within each bucket
+            buckets = bucket_of_row[rows]
+            order = np.argsort(buckets, kind='mergesort')
+            sizes = np.bincount(buckets, minlength=len(fill))
+            offset = 0
+            for bucket in np.flatnonzero(sizes):
+                taken = order[offset:offset + sizes[bucket]]
+                lo = fill[bucket]
+                hi = lo + sizes[bucket]
+                dst_indices[lo:hi] = cols[taken]
+                dst_data[lo:hi] = values[taken]
+                dst_rows[lo:hi] = rows[taken]
+                fill[bucket] = hi
+                offset += sizes[bucket]
+
+        for row_start, row_end in zip(bounds[:-1], bounds[1:]):
+            lo, hi = row_indptr[row_start], row_indptr[row_end]
+            if hi - lo < 2:
+                continue
+
+            # a stable sort on the rows leaves the columns of each row sorted
+            order = np.argsort(dst_rows[lo:hi], kind='mergesort')
+            dst_indices[lo:hi] = dst_indices[lo:hi][order]
+            dst_data[lo:hi] = dst_data[lo:hi][order]
+
+        del dst_rows
+
+    indptr_dtype = np.int32 if nnz <= np.iinfo(np.int32).max else np.int64
+    csr_grp.create_dataset('indptr', shape=(n_rows + 1,), dtype=indptr_dtype,
+                           data=row_indptr, compression=compression)
+
+
+def concat_to_hdf5(fps, output_fp, generated_by=None, compress=True,
+                   buffer_size=None):
+    """Concatenate the samples of many BIOM tables into an HDF5 BIOM file
+
+    Unlike ``Table.concat``, only one input table is held in memory at a time.
+    The matrix is streamed to the output file as the inputs are read.
+
+    Parameters
+    ----------
+    fps : iterable of str
+        The paths to the tables to concatenate. The sample IDs of the tables
+        must be disjoint.
+    output_fp : str
+        The path to write the HDF5 BIOM table to
+    generated_by : str, optional
+        A description of what generated the table. Defaults to the BIOM-Format
+        version.
+    compress : bool, optional
+        Defaults to ``True``. Whether to compress the datasets with gzip.
+    buffer_size : int, optional
+        The number of matrix elements to hold in memory while building the
+        observation oriented matrix. Defaults to the number of nonzero values
+        of the largest input table.
+
+    Raises
+    ------
+    DisjointIDError
+        If the sample IDs of the tables are not disjoint.
+
+    Notes
+    -----
+    The tables are read twice. The first pass only gathers IDs to determine
+    the observations of the output, which are sorted as with
+    ``Table.concat``. The second pass writes the sample oriented matrix of
+    each table to the output, after which the observation oriented matrix is
+    derived from it on disk.
+
+    Observation metadata are taken from the first table that contains the
+    observation. The type of the output table is that of the first table.
+
+    See Also
+    --------
+    Table.concat
+
+    Examples
+    --------
+    >>> from biom.parse import concat_to_hdf5
+    >>> concat_to_hdf5(['a.biom', 'b.biom'], 'ab.biom')  # doctest: +SKIP
+
+    """
+    fps = list(fps)
+    if generated_by is None:
+        generated_by = generatedby()
+    compression = 'gzip' if compress else None
+
+    # first pass, only gather the IDs
+    obs_ids = []
+    samp_ids = []
+    for fp in fps:
+        table_obs_ids, table_samp_ids = _load_ids(fp)
+        obs_ids.append(table_obs_ids)
+        samp_ids.append(table_samp_ids)
+
+    samp_order = np.concatenate(samp_ids) if samp_ids else np.array([])
+    if len(np.unique(samp_order)) != len(samp_order):
+        raise DisjointIDError("IDs are not disjoint")
+    obs_order = np.unique(np.concatenate(obs_ids)) if obs_ids \
+        else np.array([])
+    del obs_ids, samp_ids
+
+    obs_md = [None] * len(obs_order)
+    resolved = np.zeros(len(obs_order), dtype=bool)
+    samp_md = []
+    table_type = None
+
+    col_indptr = np.zeros(len(samp_order) + 1, dtype=np.int64)
+    n_cols = 0
+    nnz = 0
+    max_nnz = 0
+
+    with h5py.File(output_fp, 'w') as h5:
+        # second pass, stream the sample oriented matrix of each table into a
+        # staging area of the output
+        staging = h5.create_group('.concat')
+        data = staging.create_dataset('data', shape=(0,), maxshape=(None,),
+                                      dtype=np.float64, chunks=True,
+                                      compression=compression)
+        indices = staging.create_dataset('indices', shape=(0,),
+                                         maxshape=(None,), dtype=np.int32,
+                                         chunks=True, compression=compression)
+
+        for fp in fps:
+            table = load_table(fp)
+            if table_type is None:
+                table_type = table.type
+
+            positions = _id_positions(obs_order,
+                                      table.ids(axis='observation'))
+            table_obs_md = table.metadata(axis='observation')
+            if table_obs_md is not None:
+                for idx in np.flatnonzero(~resolved[positions]):
+                    obs_md[positions[idx]] = table_obs_md[idx]
+            resolved[positions] = True
+
+            table_samp_md = table.metadata()
+            if table_samp_md is None:
+                table_samp_md = [None] * len(table.ids())
+            samp_md.extend(table_samp_md)
+
+            mat = table.matrix_data.tocsc()
+            mat.sum_duplicates()
+            mat.eliminate_zeros()
+            mat = csc_matrix((mat.data, positions[mat.indices], mat.indptr),
+                             shape=(len(obs_order), mat.shape[1]))
+            mat.sort_indices()
+
+            table_cols = mat.shape[1]
+            table_nnz = mat.nnz
+            data.resize((nnz + table_nnz, ))
+            indices.resize((nnz + table_nnz, ))
+            data[nnz:] = mat.data
+            indices[nnz:] = mat.indices
+            col_indptr[n_cols + 1:n_cols + table_cols + 1] = \
+                mat.indptr[1:] + nnz
+
+            n_cols += table_cols
+            nnz += table_nnz
+            max_nnz = max(max_nnz, table_nnz)
+            del table, mat
+
+        # write everything but the matrix through the regular writer
+        skeleton = Table(csr_matrix((len(obs_order), len(samp_order))),
+                         obs_order, samp_order, obs_md, samp_md,
+                         type=table_type)
+        skeleton.to_hdf5(h5, generated_by, compress=compress)
+        h5.attrs['nnz'] = nnz
+
+        sample_matrix = h5['sample/matrix']
+        for name in ('data', 'indices', 'indptr'):
+            del sample_matrix[name]
+        h5.move('.concat/data', 'sample/matrix/data')
+        h5.move('.concat/indices', 'sample/matrix/indices')
+        indptr_dtype = np.int32 if nnz <= np.iinfo(np.int32).max \
+            else np.int64
+        sample_matrix.create_dataset('indptr', shape=(len(col_indptr), ),
+                                     dtype=indptr_dtype, data=col_indptr,
+                                     compression=compression)
+        del h5['.concat']
+
+        obs_matrix = h5['observation/matrix']
+        for name in ('data', 'indices', 'indptr'):
+            del obs_matrix[name]
+
+        if buffer_size is None:
+            buffer_size = max_nnz
+        _hdf5_csc_to_csr(sample_matrix, obs_matrix, len(obs_order),
+                         max(buffer_size, 1), compression)
@@ -8,11 +8,12 @@
 # The full license is in the file COPYING.txt, distributed with this software.
 # -----------------------------------------------------------------------------
 
-from biom.cli.table_summarizer import _summarize_table
+from biom.cli.table_summarizer import _summarize_table, _summarize_hdf5
 from biom.parse import load_table
+from biom.util import HAVE_H5PY, biom_open
 
 import tempfile
-from unittest import TestCase, main
+from unittest import TestCase, main, skipIf
 
 
 class TestSummarizeTable(TestCase):
@@ -41,6 +42,29 @@ class TestSummarizeTable(TestCase):
         # dependent
         self.assertEqual(sorted(result), sorted(summary_qualitative))
 
+    def test_observations(self):
+        result = _summarize_table(self.biom1, observations=True)
+        lines = result.splitlines()
+        self.assertEqual(lines[:3], ['Num samples: 9',
+                                     'Num observations: 14',
+                                     'Total count: 200'])
+        self.assertEqual(lines[-2:], ['None9: 37.000', '295053: 82.000'])
+        self.assertIn(' Observation Metadata Categories: taxonomy', lines)
+
+    @skipIf(not HAVE_H5PY, 'H5PY is not installed')
+    def test_hdf5(self):
+        with tempfile.NamedTemporaryFile(suffix='.biom') as fh:
+            with biom_open(fh.name, 'w') as f:
+                self.biom1.to_hdf5(f, 'test')
+            for qualitative in (False, True):
+                for observations in (False, True):
+                    exp = _summarize_table(self.biom1, qualitative,
+                                           observations)
+                    with biom_open(fh.name) as f:
+                        obs = _summarize_hdf5(f, qualitative, observations,
+                                              buffer_size=4)
+                    self.assertEqual(obs, exp)
+
 
 biom1 = ('{"id": "None","format": "Biological Observation Matrix 1.0.0",'
          '"format_url": "http://biom-format.org","type": "OTU table",'
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+# -----------------------------------------------------------------------------
+# Copyright (c) 2011-2017, The BIOM Format Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import TestCase, main
+from tempfile import TemporaryDirectory
+
+import os
+
+import numpy as np
+from click.testing import CliRunner
+
+from biom import Table, load_table
+from biom.cli.table_concatenator import concat_tables
+from biom.util import biom_open
+
+
+class TableConcatenatorTests(TestCase):
+
+    def setUp(self):
+        self.a = Table(np.array([[0, 1], [3, 0]]), ['O1', 'O2'],
+                       ['S1', 'S2'])
+        self.b = Table(np.array([[6], [0], [1]]), ['O3', 'O2', 'O1'],
+                       ['S3'])
+
+    def test_concat_tables(self):
+        with TemporaryDirectory() as tmp:
+            args = []
+            for name, table in (('a', self.a), ('b', self.b)):
+                fp = os.path.join(tmp, '%s.biom' % name)
+                with biom_open(fp, 'w') as f:
+                    table.to_hdf5(f, 'test')
+                args.extend(['-i', fp])
+            output_fp = os.path.join(tmp, 'out.biom')
+            args.extend(['-o', output_fp, '--buffer-size', '2'])
+
+            result = CliRunner().invoke(concat_tables, args)
+            self.assertEqual(result.exit_code, 0, result.output)
+            obs = load_table(output_fp)
+
+        self.assertEqual(obs, self.a.concat([self.b]))
+
+    def test_concat_tables_overlapping_samples(self):
+        with TemporaryDirectory() as tmp:
+            fp = os.path.join(tmp, 'a.biom')
+            with biom_open(fp, 'w') as f:
+                self.a.to_hdf5(f, 'test')
+            output_fp = os.path.join(tmp, 'out.biom')
+
+            result = CliRunner().invoke(concat_tables, ['-i', fp, '-i', fp,
+                                                        '-o', output_fp])
+        self.assertNotEqual(result.exit_code, 0)
+
+
+if __name__ == "__main__":
+    main()
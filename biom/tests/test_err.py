@@ -55,6 +55,23 @@ class ErrModeTests(TestCase):
         self.ex_table._sample_ids[0] = self.ex_table._sample_ids[1]
         self.assertTrue(_test_sampdup(self.ex_table))
 
+    def test_test_dup_indexed(self):
+        # an index is not built by the check
+        table = Table(np.array([[1, 2]]), ['o'], ['x', 'y'])
+        self.assertFalse(_test_sampdup(table))
+        self.assertIsNone(table._sample_index._sorter)
+
+        # the sorted order of a built index is reused, but its IDs are
+        # checked again
+        table._sample_index.positions(['x'])
+        self.assertFalse(_test_sampdup(table))
+        table._sample_ids[0] = 'y'
+        self.assertTrue(_test_sampdup(table))
+
+    def test_test_dup_unorderable(self):
+        self.ex_table._sample_ids = np.array([1, 'a', 1], dtype=object)
+        self.assertTrue(_test_sampdup(self.ex_table))
+
     def test_test_obsmdsize(self):
         self.assertFalse(_test_obsdup(self.ex_table))
         self.ex_table._observation_metadata = \
@@ -173,6 +190,9 @@ class ErrorProfileTests(TestCase):
         with self.assertRaises(KeyError):
             self.ep.register('foo', 'missing', 2, lambda: None)
 
+        with self.assertRaises(KeyError):
+            self.ep.register('foo', 'bar', 'ignore', test, level='none')
+
         with self.assertRaises(KeyError):
             self.ep.unregister('non_existant')
 
@@ -230,6 +250,32 @@ class SupportTests(TestCase):
         self.assertEqual(result, "the callback called")
         self.assertNotEqual(geterr()['empty'], 'call')
 
+    def test_errstate_validation(self):
+        data = np.array([[1, 2], [3, 4]])
+        with errstate(validation='structural'):
+            self.assertEqual(runtime_ep.validation, 'structural')
+            Table(data, ['a', 'a'], ['b', 'c'])
+            with self.assertRaises(TableException):
+                Table(data, ['a', 'b', 'c'], ['b', 'c'])
+
+        with errstate(validation='none'):
+            Table(data, ['a', 'b', 'c'], ['b', 'c'])
+
+        self.assertEqual(runtime_ep.validation, 'full')
+        with self.assertRaises(TableException):
+            Table(data, ['a', 'a'], ['b', 'c'])
+
+    def test_seterr_validation(self):
+        old = seterr(validation='none', empty='raise')
+        self.assertEqual(old['validation'], 'full')
+        self.assertIsNone(errcheck(Table([], [], [])))
+        seterr(**old)
+        self.assertEqual(runtime_ep.validation, 'full')
+        self.assertEqual(geterr(), runtime_ep_state)
+
+        with self.assertRaises(KeyError):
+            seterr(validation='foo')
+
 
 if __name__ == '__main__':
     main()
@@ -11,16 +11,18 @@
 import os
 from io import StringIO
 import json
+from tempfile import TemporaryDirectory
 from unittest import TestCase, main
 
 import numpy as np
 import numpy.testing as npt
 import pytest
 
+from biom.exception import BiomParseException, DisjointIDError
 from biom.parse import (generatedby, MetadataMap, parse_biom_table, parse_uc,
-                        load_table)
+                        load_table, concat_to_hdf5)
 from biom.table import Table
-from biom.util import HAVE_H5PY, __version__
+from biom.util import HAVE_H5PY, __version__, biom_open
 from biom.tests.long_lines import (uc_empty, uc_invalid_id, uc_minimal,
                                    uc_lib_minimal,
                                    uc_seed_hits, uc_mixed_hits,
@@ -154,6 +156,30 @@ class ParseTests(TestCase):
         obs = MetadataMap.from_file(s1, header=header)
         self.assertEqual(obs, exp)
 
+    def test_metadata_map_dataframe(self):
+        s1 = ['#sample\ta\tb', '#comment line to skip',
+              'x \t y \t z;w ', ' ', '#more skip', '"i"\tj', 'k\t1\tz;w']
+        obs = MetadataMap.dataframe_from_file(
+            s1, process_fns={'b': lambda x: x.split(';')})
+        self.assertEqual(list(obs.index), ['x', 'i', 'k'])
+        self.assertEqual(list(obs.columns), ['a', 'b'])
+        self.assertEqual(obs.loc['x'].tolist(), ['y', ['z', 'w']])
+        self.assertEqual(obs.loc['i'].tolist(), ['j', ['']])
+        self.assertEqual(obs.loc['k', 'b'], ['z', 'w'])
+        self.assertEqual(obs.to_dict('index'), MetadataMap.from_file(
+            s1, process_fns={'b': lambda x: x.split(';')}))
+
+        with self.assertRaisesRegex(BiomParseException, 'not unique'):
+            MetadataMap.dataframe_from_file(['#sample\ta', 'x\t1',
+                                             'x\t2'])
+
+        s2 = ['#sample\ta\tb', 'x\t "y" \t z', '"i"\tj']
+        for strip_quotes in (True, False):
+            obs = MetadataMap.dataframe_from_file(
+                s2, strip_quotes=strip_quotes, suppress_stripping=True)
+            self.assertEqual(obs.to_dict('index'), MetadataMap.from_file(
+                s2, strip_quotes=strip_quotes, suppress_stripping=True))
+
     def test_parse_biom_json(self):
         """test the biom otu table parser"""
         # light test. this code is used thoroughly within the other
@@ -313,6 +339,52 @@ class ParseTests(TestCase):
         load_table(open('test_data/test.json'))
         os.chdir(cwd)
 
+    def test_load_table_components(self):
+        t = Table(np.array([[0, 1, 2], [3, 4, 0]]), ['O1', 'O2'],
+                  ['S1', 'S2', 'S3'],
+                  [{'taxonomy': ['k', 'p']}, {'taxonomy': ['k', 'q']}],
+                  [{'env': 'a'}, {'env': 'b'}, {'env': 'a'}])
+        no_data = Table(np.zeros((2, 3)), t.ids(axis='observation'),
+                        t.ids(), t.metadata(axis='observation'),
+                        t.metadata())
+        ids_only = Table(np.zeros((2, 3)), t.ids(axis='observation'),
+                         t.ids())
+
+        with TemporaryDirectory() as tmp:
+            fps = [os.path.join(tmp, 'table.json')]
+            with open(fps[0], 'w') as f:
+                f.write(t.to_json('test'))
+            if HAVE_H5PY:
+                fps.append(os.path.join(tmp, 'table.biom'))
+                with biom_open(fps[1], 'w') as f:
+                    t.to_hdf5(f, 'test')
+
+            for fp in fps:
+                self.assertEqual(load_table(fp, components={'ids'}),
+                                 ids_only)
+                self.assertEqual(load_table(fp, components=['metadata']),
+                                 no_data)
+                self.assertEqual(load_table(fp, components={'ids', 'data'}),
+                                 Table(t.matrix_data, t.ids('observation'),
+                                       t.ids()))
+                self.assertEqual(load_table(fp), t)
+                with self.assertRaisesRegex(ValueError, 'components'):
+                    load_table(fp, components={'ids', 'matrix'})
+
+        # "data" is also a metadata category, so the matrix is located by
+        # parsing the table
+        t.add_metadata({'S1': {'data': [[1, 2]]}})
+        json_table = json.loads(t.to_json('test'))
+        json_table['data'] = json_table.pop('data')
+        biom_str = json.dumps(json_table)
+        self.assertLess(biom_str.index('"data": [[1, 2]]'),
+                        biom_str.index('"data": [[0, 1, 1.0]'))
+        obs = parse_biom_table(StringIO(biom_str),
+                               components={'ids', 'metadata'})
+        self.assertEqual(obs.metadata('S1')['data'], [[1, 2]])
+        self.assertEqual(obs.matrix_data.nnz, 0)
+        self.assertEqual(obs.shape, (2, 3))
+
     def test_load_table_inmemory_stringio(self):
         load_table(StringIO('\n'.join(self.classic_otu_table1_no_tax)))
 
@@ -381,6 +453,52 @@ class ParseTests(TestCase):
         t_json = parse_biom_table(t_json_stringio)
         self.assertEqual(t, t_json)
 
+    @pytest.mark.skipif(HAVE_H5PY is False, reason='H5PY is not installed')
+    def test_concat_to_hdf5(self):
+        a = Table(np.array([[0, 1, 2], [3, 0, 5]]), ['O3', 'O1'],
+                  ['S1', 'S2', 'S3'],
+                  [{'taxonomy': ['k', 'p3']}, {'taxonomy': ['k', 'p1']}],
+                  [{'env': 'a'}, {'env': 'a'}, {'env': 'a'}])
+        b = Table(np.array([[6, 7], [0, 9], [1, 0]]), ['O2', 'O3', 'O4'],
+                  ['S4', 'S5'],
+                  [{'taxonomy': ['k', 'p2']}, {'taxonomy': ['k', 'x']},
+                   {'taxonomy': ['k', 'p4']}],
+                  [{'env': 'b'}, {'env': 'b'}])
+        c = Table(np.array([[4], [8]]), ['O1', 'O5'], ['S6'],
+                  [{'taxonomy': ['k', 'x']}, {'taxonomy': ['k', 'p5']}],
+                  [{'env': 'c'}])
+        exp = a.concat([b, c])
+
+        with TemporaryDirectory() as tmp:
+            fps = []
+            for name, table in zip('abc', (a, b, c)):
+                fp = os.path.join(tmp, '%s.biom' % name)
+                with biom_open(fp, 'w') as f:
+                    table.to_hdf5(f, 'test')
+                fps.append(fp)
+
+            # a JSON table is read through the regular parser
+            with open(fps[-1], 'w') as f:
+                f.write(c.to_json('test'))
+
+            output_fp = os.path.join(tmp, 'out.biom')
+            for buffer_size in (None, 1, 3, 100):
+                concat_to_hdf5(fps, output_fp, buffer_size=buffer_size)
+                obs = load_table(output_fp)
+                self.assertEqual(obs, exp)
+
+                with h5py.File(output_fp, 'r') as f:
+                    self.assertEqual(list(f), ['observation', 'sample'])
+                    self.assertEqual(f.attrs['nnz'], 10)
+                    npt.assert_equal(f['observation/matrix/indptr'][:],
+                                     np.array([0, 3, 5, 8, 9, 10]))
+                    npt.assert_equal(f['observation/matrix/indices'][:],
+                                     np.array([0, 2, 5, 3, 4, 1, 2, 4, 3,
+                                               5]))
+
+            with self.assertRaises(DisjointIDError):
+                concat_to_hdf5(fps + fps[:1], output_fp)
+
     def test_empty_metadata_inconsistent_handling(self):
         oids = list('bacd')
         sids = list('YXZ')
@@ -16,6 +16,7 @@ import numpy.testing as npt
 import numpy as np
 from scipy.sparse import lil_matrix, csr_matrix, csc_matrix
 import scipy.sparse
+from scipy.spatial.distance import pdist, squareform
 import pandas.util.testing as pdt
 import pandas as pd
 import pytest
@@ -28,9 +29,12 @@ from biom.table import (Table, prefer_self, index_list, list_nparray_to_sparse,
                         list_dict_to_sparse, dict_to_sparse,
                         coo_arrays_to_sparse, list_list_to_sparse,
                         nparray_to_sparse, list_sparse_to_sparse,
-                        _identify_bad_value, general_parser)
+                        _identify_bad_value, general_parser, _IDIndex,
+                        ColumnarMetadata)
 from biom.parse import parse_biom_table
 from biom.err import errstate
+from biom._filter import _filter
+from biom._transform import _transform
 
 np.random.seed(1234)
 
@@ -94,6 +98,14 @@ class SupportTests(TestCase):
         self.assertIsNot(obs, exp)
         self.assertEqual(obs, exp)
 
+    def test_head_csc(self):
+        table = example_table.copy()
+        table._data = table._data.tocsc()
+        obs = table.head(1, 2)
+        exp = example_table.head(1, 2)
+        self.assertEqual(obs, exp)
+        self.assertEqual(obs.shape, (1, 2))
+
     def test_head_zero_or_neg(self):
         with self.assertRaises(IndexError):
             example_table.head(0)
@@ -301,6 +313,28 @@ class SupportTests(TestCase):
         with self.assertRaises(DisjointIDError):
             example_table.concat([example_table], axis='observation')
 
+    def test_concat_many_observations_unsorted(self):
+        tables = [Table(np.array([[i, 0], [0, i + 1]]),
+                        ['O%d' % (2 * i), 'O%d' % (2 * i + 1)],
+                        ['S%d' % (i % 3), 'S%d' % ((i + 1) % 3)],
+                        None,
+                        [{'src': i}, {'src': i}])
+                  for i in range(4)]
+        obs = tables[0].concat(tables[1:], axis='observation')
+
+        exp_data = np.array([[0, 0, 0], [0, 1, 0], [0, 1, 0], [0, 0, 2],
+                             [0, 0, 2], [3, 0, 0], [3, 0, 0], [0, 4, 0]])
+        npt.assert_equal(obs.matrix_data.toarray(), exp_data)
+        npt.assert_equal(obs.ids(), np.array(['S0', 'S1', 'S2']))
+        npt.assert_equal(obs.ids(axis='observation'),
+                         np.array(['O%d' % i for i in range(8)]))
+
+        # sample metadata are from the first table with the sample
+        self.assertEqual([md['src'] for md in obs.metadata()], [0, 0, 1])
+
+        with self.assertRaises(UnknownAxisError):
+            tables[0].concat(tables[1:], axis='foo')
+
     def test_align_to_no_overlap(self):
         a = Table(np.array([[0, 1], [2, 3]]), ['a', 'b'], ['c', 'd'])
         b = Table(np.array([[0, 1], [2, 3]]), ['w', 'x'], ['y', 'z'])
@@ -470,6 +504,153 @@ class SupportTests(TestCase):
         obs = index_list(['b', 'c', 'a'])
         self.assertEqual(obs, exp)
 
+    def test_columnar_metadata(self):
+        rows = [{'taxonomy': ['k__a', 'p__b'], 'depth': 1},
+                None,
+                {'taxonomy': ['k__a', 'p__b']}]
+        md = ColumnarMetadata.from_rows(rows)
+        self.assertEqual(len(md), 3)
+        self.assertEqual(md.categories, ['taxonomy', 'depth'])
+        self.assertEqual(md, ({'taxonomy': ['k__a', 'p__b'], 'depth': 1},
+                              {}, {'taxonomy': ['k__a', 'p__b']}))
+
+        # shared values are stored once
+        self.assertEqual(len(md._columns['taxonomy'].values), 1)
+        self.assertEqual(md[-1]['taxonomy'], ['k__a', 'p__b'])
+        self.assertIsNone(md[2]['depth'])
+        self.assertNotIn('depth', md[2])
+        self.assertEqual(md[2].get('depth', 'missing'), 'missing')
+        self.assertTrue(md)
+        self.assertFalse(ColumnarMetadata.from_rows([None, {}]))
+        self.assertFalse(md.complete('depth'))
+        npt.assert_equal(md.column('depth'), [1, None, None])
+
+        taken = md.take([2, 0])
+        self.assertEqual(taken, ({'taxonomy': ['k__a', 'p__b']},
+                                 {'taxonomy': ['k__a', 'p__b'], 'depth': 1}))
+
+        # rows are views which can be updated
+        taken[0]['depth'] = 5
+        del taken[1]['taxonomy']
+        self.assertEqual(taken, ({'taxonomy': ['k__a', 'p__b'], 'depth': 5},
+                                 {'depth': 1}))
+        self.assertEqual(md[2], {'taxonomy': ['k__a', 'p__b']})
+        self.assertEqual(md[0]['taxonomy'], ['k__a', 'p__b'])
+
+        combined = ColumnarMetadata.concat(
+            [md, ColumnarMetadata.from_columns({'other': ['x']})])
+        self.assertEqual(combined, tuple(rows[:1]) + ({}, rows[2],
+                                                      {'other': 'x'}))
+
+    def test_columnar_metadata_lists_are_copies(self):
+        md = ColumnarMetadata.from_rows([{'taxonomy': ['k__a', 'p__b']},
+                                         {'taxonomy': ['k__a', 'p__b']}])
+        taxonomy = md[0]['taxonomy']
+        taxonomy.append('c__c')
+        self.assertEqual(md[0]['taxonomy'], ['k__a', 'p__b'])
+
+        md[0]['taxonomy'] = taxonomy
+        self.assertEqual(md[0]['taxonomy'], ['k__a', 'p__b', 'c__c'])
+        self.assertEqual(md[1]['taxonomy'], ['k__a', 'p__b'])
+
+    def test_columnar_metadata_from_columns_bad_length(self):
+        with self.assertRaises(TableException):
+            ColumnarMetadata.from_columns({'a': [1, 2], 'b': [1]})
+
+    def test_columnar_metadata_from_dataframe(self):
+        df = pd.DataFrame({'depth': [1, 2, 1],
+                           'site': ['x', np.nan, 'x'],
+                           'taxonomy': [['k__a'], ['k__b'], ['k__a']]})
+        obs = ColumnarMetadata.from_dataframe(df)
+        self.assertEqual(obs.to_rows(),
+                         ({'depth': 1, 'site': 'x', 'taxonomy': ['k__a']},
+                          {'depth': 2, 'taxonomy': ['k__b']},
+                          {'depth': 1, 'site': 'x', 'taxonomy': ['k__a']}))
+        self.assertIs(type(obs[0]['depth']), int)
+
+    def test_id_index(self):
+        index = _IDIndex(np.array(['b', 'c', 'a', 'c']))
+        self.assertIsNone(index._sorter)
+        self.assertEqual(index['b'], 0)
+        self.assertEqual(index['c'], 3)
+        self.assertIn('a', index)
+        self.assertNotIn('d', index)
+        self.assertNotIn(1, index)
+        with self.assertRaises(KeyError):
+            index['d']
+        self.assertEqual(index, index_list(['b', 'c', 'a', 'c']))
+
+        npt.assert_equal(index.positions(['a', 'd', 'b']), [2, -1, 0])
+        npt.assert_equal(index.positions([1, 2]), [-1, -1])
+
+        # the dict was built first, so the IDs are not sorted as well
+        self.assertIsNone(index._sorter)
+
+    def test_id_index_sorted(self):
+        index = _IDIndex(np.array(['b', 'c', 'a', 'c']))
+        npt.assert_equal(index.positions(['a', 'd', 'b']), [2, -1, 0])
+
+        # single IDs are resolved from the sorted IDs, without a dict
+        self.assertEqual(index['b'], 0)
+        self.assertEqual(index['c'], 3)
+        self.assertIn('a', index)
+        self.assertNotIn('d', index)
+        self.assertNotIn('0', index)
+        self.assertNotIn(1, index)
+        self.assertNotIn(('a',), index)
+        with self.assertRaises(KeyError):
+            index['d']
+        with self.assertRaises(TypeError):
+            index[['a']]
+        self.assertEqual(index, index_list(['b', 'c', 'a', 'c']))
+        self.assertIsNone(index._hash)
+
+        index = _IDIndex(np.array([3, 1, 2]))
+        index.positions([1])
+        self.assertEqual(index[2], 2)
+        self.assertEqual(index[1.0], 1)
+        self.assertNotIn('1', index)
+
+        ids = np.empty(2, dtype=object)
+        ids[:] = [('a', 1), ('b', 2)]
+        index = _IDIndex(ids)
+        index.positions([])
+        self.assertEqual(index[('b', 2)], 1)
+        self.assertNotIn(('c', 3), index)
+        self.assertNotIn(1, index)
+        self.assertIsNone(index._hash)
+
+    def test_id_index_coerced(self):
+        # such as IDs read from HDF5, and the index of a DataFrame
+        index = _IDIndex(np.array(['b', 'c', 'a'], dtype=object))
+        npt.assert_equal(index.positions(np.array(['a', 'd', 'c'])),
+                         [2, -1, 1])
+        self.assertIsNone(index._hash)
+
+        index = _IDIndex(np.array(['b', 'c', 'a']))
+        query = pd.Index(['a', 'd', 'c']).to_numpy()
+        npt.assert_equal(index.positions(query), [2, -1, 1])
+        self.assertIsNone(index._hash)
+
+        # incomparable IDs are resolved one at a time
+        npt.assert_equal(index.positions(np.array(['a', 1], dtype=object)),
+                         [2, -1])
+
+    def test_id_index_mask(self):
+        ids = np.array(['b', 'c', 'a', 'd'])
+        index = _IDIndex(ids)
+        index.positions(['a'])
+        keep = np.array([True, False, True, True])
+        obs = index.mask(keep)
+        self.assertIsNotNone(obs._sorter)
+        self.assertEqual(obs, {'b': 0, 'a': 1, 'd': 2})
+        npt.assert_equal(obs._sorted, ['a', 'b', 'd'])
+
+        # an index which is not built is derived lazily
+        obs = _IDIndex(ids).mask(keep)
+        self.assertIsNone(obs._sorter)
+        self.assertEqual(obs, {'b': 0, 'a': 1, 'd': 2})
+
 
 class TableTests(TestCase):
 
@@ -620,6 +801,18 @@ class TableTests(TestCase):
         obs = self.simple_derived.max('whole')
         npt.assert_equal(obs, exp)
 
+    def test_min_max_empty_vector(self):
+        t = Table(np.array([[0, 2, -1], [0, 3, 4]]), ['a', 'b'],
+                  ['x', 'y', 'z'])
+        npt.assert_equal(t.min('sample'), np.array([0, 2, -1]))
+        npt.assert_equal(t.max('sample'), np.array([0, 3, 4]))
+        npt.assert_equal(t.min('observation'), np.array([-1, 3]))
+        npt.assert_equal(t.max('observation'), np.array([2, 4]))
+
+        t = Table(np.zeros((2, 2)), ['a', 'b'], ['x', 'y'])
+        self.assertEqual(t.min('whole'), 0)
+        self.assertEqual(t.max('whole'), 0)
+
     def test_general_parser(self):
         test_and_exp = [(b'foo', 'foo'),
                         ('foo', 'foo'),
@@ -672,6 +865,32 @@ class TableTests(TestCase):
         self.assertTrue(isinstance(t.table_id, str))
         self.assertTrue(isinstance(t.type, str))
 
+    @pytest.mark.skipif(HAVE_H5PY is False, reason='H5PY is not installed')
+    def test_from_hdf5_columnar_metadata(self):
+        cwd = os.getcwd()
+        if '/' in __file__:
+            os.chdir(__file__.rsplit('/', 1)[0])
+        exp = Table.from_hdf5(h5py.File('test_data/test.biom'))
+        obs = Table.from_hdf5(h5py.File('test_data/test.biom'),
+                              columnar_metadata=True)
+        subset = Table.from_hdf5(h5py.File('test_data/test.biom'),
+                                 ids=['Sample2', 'Sample4'],
+                                 columnar_metadata=True)
+        os.chdir(cwd)
+
+        self.assertIsInstance(obs.metadata(), ColumnarMetadata)
+        self.assertIsInstance(obs.metadata(axis='observation'),
+                              ColumnarMetadata)
+        self.assertEqual(obs, exp)
+        self.assertIsInstance(subset.metadata(), ColumnarMetadata)
+        self.assertEqual(subset.metadata(), exp.metadata()[1::2][:2])
+
+        with NamedTemporaryFile() as tmpfile:
+            with h5py.File(tmpfile.name, 'w') as h5:
+                obs.to_hdf5(h5, 'tests')
+            with h5py.File(tmpfile.name, 'r') as h5:
+                self.assertEqual(Table.from_hdf5(h5), exp)
+
     @pytest.mark.skipif(HAVE_H5PY is False, reason='H5PY is not installed')
     def test_from_hdf5(self):
         """Parse a hdf5 formatted BIOM table"""
@@ -984,6 +1203,66 @@ class TableTests(TestCase):
                             axis='observation')
         os.chdir(cwd)
 
+    @pytest.mark.skipif(HAVE_H5PY is False, reason='H5PY is not installed')
+    def test_from_hdf5_window(self):
+        cwd = os.getcwd()
+        if '/' in __file__:
+            os.chdir(__file__.rsplit('/', 1)[0])
+        f = h5py.File('test_data/test.biom', 'r')
+        full = Table.from_hdf5(f)
+
+        def window(obs, samp):
+            table = full.filter(full.ids(axis='observation')[obs],
+                                axis='observation', inplace=False)
+            return table.filter(full.ids()[samp])
+
+        for obs, samp in [(slice(0, 2), slice(0, 3)),
+                          (slice(1, 4), None),
+                          (None, slice(-2, None)),
+                          (slice(4, 100), slice(5, 6))]:
+            obs_t = Table.from_hdf5(f, obs_slice=obs, samp_slice=samp,
+                                    columnar_metadata=True)
+            exp = window(obs or slice(None), samp or slice(None))
+            self.assertEqual(obs_t, exp)
+            self.assertEqual(obs_t.table_id, full.table_id)
+
+        # empty vectors of the window are retained, such as GG_OTU_3 which
+        # is absent from Sample5
+        obs_t = Table.from_hdf5(f, obs_slice=slice(2, 3),
+                                samp_slice=slice(4, 5))
+        npt.assert_equal(obs_t.ids(axis='observation'), ['GG_OTU_3'])
+        npt.assert_equal(obs_t.ids(), ['Sample5'])
+        npt.assert_equal(obs_t.matrix_data.toarray(), [[0]])
+
+        obs_t = Table.from_hdf5(f, obs_slice=slice(2, 2))
+        self.assertEqual(obs_t.shape, (0, 6))
+
+        # an empty window keeps the empty metadata of its axis
+        for obs, samp in [(slice(2, 2), slice(None)),
+                          (slice(None), slice(3, 3))]:
+            obs_t = Table.from_hdf5(f, obs_slice=obs, samp_slice=samp)
+            exp = window(obs, samp)
+            self.assertEqual(obs_t, exp)
+            self.assertEqual(obs_t.metadata(axis='observation'),
+                             exp.metadata(axis='observation'))
+            self.assertEqual(obs_t.metadata(), exp.metadata())
+        obs_t = Table.from_hdf5(f, obs_slice=slice(2, 2))
+        self.assertEqual(obs_t.metadata(axis='observation'), ())
+        self.assertEqual(obs_t.metadata()[0]['BarcodeSequence'],
+                         'CGCTTATCGAGA')
+        obs_t = Table.from_hdf5(f, obs_slice=slice(2, 2),
+                                columnar_metadata=True)
+        md = obs_t.metadata(axis='observation')
+        self.assertIsInstance(md, ColumnarMetadata)
+        self.assertEqual(len(md), 0)
+
+        with self.assertRaises(ValueError):
+            Table.from_hdf5(f, ids=['Sample1'], samp_slice=slice(0, 2))
+        with self.assertRaises(ValueError):
+            Table.from_hdf5(f, obs_slice=slice(0, 4, 2))
+        f.close()
+        os.chdir(cwd)
+
     @pytest.mark.skipif(HAVE_H5PY is False, reason='H5PY is not installed')
     def test_from_hdf5_empty_table(self):
         """HDF5 biom parse successfully loads an empty table"""
@@ -1587,6 +1866,93 @@ class TableTests(TestCase):
         obs = example_table.to_dataframe(dense=True)
         pdt.assert_frame_equal(obs, exp)
 
+    def test_to_dataframe_shares_data(self):
+        t = example_table.copy()
+        t._data = t._data.tocsc()
+        df = t.to_dataframe()
+        self.assertTrue(np.shares_memory(df['S3'].array.sp_values,
+                                         t.matrix_data.data))
+
+        # modifying the table leaves the frame untouched
+        t.transform(lambda v, i, md: v + 10)
+        npt.assert_equal(df.sparse.to_dense().values,
+                         [[0, 1, 2], [3, 4, 5]])
+
+    def test_to_dataframe_leaves_table(self):
+        t = example_table.copy()
+        data = t.matrix_data
+        t.to_dataframe()
+        self.assertIs(t.matrix_data, data)
+        self.assertEqual(data.format, 'csr')
+
+    def test_shared_data_not_made_canonical(self):
+        # a stored zero is shared with the frame
+        mat = csc_matrix((np.array([1., 0., 2.]), np.array([0, 1, 1]),
+                          np.array([0, 2, 3])), shape=(2, 2))
+        t = Table(mat, ['O1', 'O2'], ['S1', 'S2'])
+        t._data = mat
+        df = t.to_dataframe()
+        self.assertEqual(t.nnz, 2)
+        npt.assert_equal(t.nonzero_counts('sample'), [1, 1])
+        npt.assert_equal(t.max('sample'), [1, 2])
+        self.assertEqual(mat.nnz, 3)
+        npt.assert_equal(df['S1'].array.sp_values, [1, 0])
+
+    def test_min_max_whole_stored_zeros(self):
+        mat = csr_matrix((np.array([0., 5., 7.]), np.array([0, 1, 0]),
+                          np.array([0, 2, 3])), shape=(2, 2))
+        t = Table(mat, ['O1', 'O2'], ['S1', 'S2'])
+        t._data = mat
+        self.assertEqual(t.min('whole'), 5)
+        self.assertEqual(t.max('whole'), 7)
+        self.assertEqual(mat.nnz, 3)
+
+    def test_from_dataframe(self):
+        obs_md = pd.DataFrame({'taxonomy': ['k__a', 'k__b']},
+                              index=['O2', 'O1'])
+        samp_md = pd.DataFrame({'environment': ['A', 'B', None]},
+                               index=['S1', 'S2', 'S3'])
+        for dense in (True, False):
+            df = example_table.to_dataframe(dense=dense)
+            obs = Table.from_dataframe(df, obs_md, samp_md, table_id='foo')
+            npt.assert_equal(obs.matrix_data.toarray(),
+                             example_table.matrix_data.toarray())
+            npt.assert_equal(obs.ids(), ['S1', 'S2', 'S3'])
+            npt.assert_equal(obs.ids(axis='observation'), ['O1', 'O2'])
+            self.assertEqual(obs.table_id, 'foo')
+            self.assertEqual(obs.metadata('O1', axis='observation'),
+                             {'taxonomy': 'k__b'})
+            self.assertEqual(obs.metadata('S2'), {'environment': 'B'})
+            self.assertEqual(obs.metadata('S3'), {})
+
+    def test_from_dataframe_dtype(self):
+        df = pd.DataFrame({'S1': [1, 0], 'S2': [0, 3]}, index=['O1', 'O2'],
+                          dtype=np.int32)
+        obs = Table.from_dataframe(df.astype(pd.SparseDtype(np.int32, 0)))
+        self.assertEqual(obs.dtype, np.int32)
+        npt.assert_equal(obs.matrix_data.toarray(), [[1, 0], [0, 3]])
+        self.assertIsNone(obs.metadata())
+
+        # a sparse column which does not omit zeros is densified
+        df = pd.DataFrame({'S1': pd.arrays.SparseArray([1., 2.],
+                                                       fill_value=1.),
+                           'S2': pd.arrays.SparseArray([0., 3.])},
+                          index=['O1', 'O2'])
+        obs = Table.from_dataframe(df)
+        npt.assert_equal(obs.matrix_data.toarray(), [[1, 0], [2, 3]])
+
+    @pytest.mark.skipif(not HAVE_ANNDATA, reason="anndata not installed")
+    def test_anndata_roundtrip(self):
+        adata = example_table.to_anndata(dtype=None)
+        obs = Table.from_anndata(adata)
+        self.assertEqual(obs, example_table)
+
+        obs = Table.from_anndata(example_table.to_anndata(transpose=False),
+                                 transpose=False)
+        self.assertEqual(obs.dtype, np.float32)
+        npt.assert_equal(obs.matrix_data.toarray(),
+                         example_table.matrix_data.toarray())
+
     @pytest.mark.skipif(not HAVE_ANNDATA, reason="anndata not installed")
     def test_to_anndata_dense(self):
         exp = example_table.to_dataframe(dense=True)
@@ -1632,6 +1998,41 @@ class TableTests(TestCase):
         obs_obs = tab.metadata_to_dataframe(axis='observation')
         pdt.assert_frame_equal(obs_obs, exp_obs)
 
+    def test_metadata_to_dataframe_mixed(self):
+        md = [{'taxonomy': ('k__foo', 'p__bar'), 'depth': 1},
+              {'taxonomy': ['k__foo', 'p__baz', 'c__x'], 'site': 'a'},
+              {'depth': 3, 'site': 'a'}]
+        tab = Table(np.array([[1, 2, 3]]).T, ['a', 'b', 'c'], ['d'], md)
+        exp = pd.DataFrame({'depth': [1, np.nan, 3],
+                            'site': [None, 'a', 'a'],
+                            'taxonomy_0': ['k__foo', 'k__foo', None],
+                            'taxonomy_1': ['p__bar', 'p__baz', None],
+                            'taxonomy_2': [None, 'c__x', None]},
+                           index=['a', 'b', 'c'])
+        obs = tab.metadata_to_dataframe('observation')
+        pdt.assert_frame_equal(obs, exp)
+
+        tab = Table(np.array([[1, 2, 3]]).T, ['a', 'b', 'c'], ['d'],
+                    ColumnarMetadata.from_rows(md))
+        obs = tab.metadata_to_dataframe('observation')
+        pdt.assert_frame_equal(obs, exp)
+
+    def test_metadata_to_dataframe_categorical(self):
+        obs = example_table.metadata_to_dataframe('observation',
+                                                  categorical=True)
+        self.assertEqual(obs['taxonomy_0'].dtype, 'category')
+        self.assertEqual(list(obs['taxonomy_0'].cat.categories),
+                         ['Bacteria'])
+        npt.assert_equal(obs['taxonomy_1'].astype(object).values,
+                         ['Firmicutes', 'Bacteroidetes'])
+
+        tab = Table(np.array([[1, 2]]), ['a'], ['b', 'c'], None,
+                    [{'depth': 1, 'site': 'x'}, {'depth': 2}])
+        obs = tab.metadata_to_dataframe('sample', categorical=True)
+        self.assertEqual(obs['depth'].dtype, np.int64)
+        self.assertEqual(obs['site'].dtype, 'category')
+        self.assertTrue(obs['site'].isna()['c'])
+
     def test_metadata_to_dataframe_badaxis(self):
         with self.assertRaises(UnknownAxisError):
             example_table.metadata_to_dataframe(axis='foo')
@@ -1834,6 +2235,69 @@ class TableTests(TestCase):
         self.assertEqual(t._sample_metadata[2]['Treatment'], 'Fasting')
         self.assertEqual(t._sample_metadata[3]['Treatment'], 'Control')
 
+    def test_add_metadata_dataframe(self):
+        d = np.array([[1, 2, 3], [4, 5, 6]])
+        t = Table(d, ['O1', 'O2'], ['S1', 'S2', 'S3'])
+        md = pd.DataFrame({'pH': [7.5, np.nan, 6.0],
+                           'env': ['gut', 'soil', 'gut']},
+                          index=['S3', 'S1', 'S4'])
+        t.add_metadata(md)
+        self.assertEqual(t.metadata('S3'), {'pH': 7.5, 'env': 'gut'})
+        self.assertEqual(t.metadata('S1'), {'env': 'soil'})
+        self.assertEqual(t.metadata('S2'), {})
+        self.assertIsNone(t.metadata('S2')['env'])
+        self.assertIsNone(t.metadata(axis='observation'))
+        self.assertIsInstance(t.metadata(), tuple)
+
+        # update existing metadata, including a new category
+        md = pd.DataFrame({'env': ['sea'], 'depth': [[1, 2]]}, index=['S1'])
+        copied = t.copy()
+        copied.add_metadata(md)
+        self.assertEqual(copied.metadata('S1'),
+                         {'env': 'sea', 'depth': [1, 2]})
+        self.assertEqual(copied.metadata('S3'), {'pH': 7.5, 'env': 'gut'})
+        self.assertEqual(t.metadata('S1'), {'env': 'soil'})
+
+    def test_add_metadata_dataframe_existing(self):
+        d = np.array([[1, 2], [4, 5]])
+        samp_md = [{'Treatment': 'Control'}, {'Treatment': 'Fasting'}]
+        t = Table(d, ['O1', 'O2'], ['S1', 'S2'], sample_metadata=samp_md)
+        untouched = t.metadata('S1')
+        md = pd.DataFrame({'barcode': ['AAAA'], 'Treatment': [None]},
+                          index=['S2'])
+        t.add_metadata(md)
+        self.assertIs(t.metadata('S1'), untouched)
+        self.assertEqual(t.metadata('S2'),
+                         {'Treatment': 'Fasting', 'barcode': 'AAAA'})
+        self.assertIsNone(t.metadata('S2')['missing'])
+        self.assertEqual(samp_md[1], {'Treatment': 'Fasting'})
+
+    def test_add_metadata_dataframe_columnar(self):
+        t = Table(np.array([[1, 2]]), ['O1'], ['S1', 'S2'])
+        md = pd.DataFrame({'env': ['gut']}, index=['S2'])
+        t.add_metadata(md, columnar=True)
+        self.assertIsInstance(t.metadata(), ColumnarMetadata)
+        self.assertEqual(t.metadata('S2'), {'env': 'gut'})
+        self.assertEqual(t.metadata('S1'), {})
+
+    def test_add_metadata_dataframe_shared_values(self):
+        t = Table(np.array([[1, 2]]), ['O1'], ['S1', 'S2'])
+        taxonomy = ['k__a', 'p__b']
+        md = pd.DataFrame({'taxonomy': [taxonomy, taxonomy]},
+                          index=['S1', 'S2'])
+        t.add_metadata(md)
+        t.metadata('S1')['taxonomy'].append('c__c')
+        self.assertEqual(t.metadata('S2')['taxonomy'], ['k__a', 'p__b'])
+        self.assertEqual(taxonomy, ['k__a', 'p__b'])
+
+    def test_add_metadata_dataframe_invalid(self):
+        t = Table(np.array([[1, 2]]), ['O1'], ['S1', 'S2'])
+        md = pd.DataFrame({'a': [1, 2]}, index=['S1', 'S1'])
+        with self.assertRaises(TableException):
+            t.add_metadata(md)
+        with self.assertRaises(UnknownAxisError):
+            t.add_metadata(md, axis='foo')
+
     def test_add_sample_metadata_two_entries(self):
         """ add_sample_metadata functions with more than one md entry """
         obs_ids = [1, 2, 3]
@@ -2334,6 +2798,19 @@ class SparseTableTests(TestCase):
         npt.assert_equal(self.st1.reduce(f, 'sample'), np.array([17, 20]))
         npt.assert_equal(self.st1.reduce(f, 'observation'), np.array([16, 22]))
 
+    def test_reduce_ufunc(self):
+        """Reduce with a ufunc over the sparse representation"""
+        t = Table(np.array([[0, 2, -1, 0], [0, 3, 4, 5], [0, 1, -2, 6]]),
+                  ['a', 'b', 'c'], ['w', 'x', 'y', 'z'])
+        for f in (np.add, np.multiply, np.maximum, np.minimum):
+            for axis in ('sample', 'observation'):
+                exp = np.array([f.reduce(v) for v in
+                                t.iter_data(axis=axis)])
+                npt.assert_equal(t.reduce(f, axis), exp)
+
+                exp = t.reduce(lambda x, y: f(x, y), axis)
+                npt.assert_equal(t.reduce(f, axis), exp)
+
     def test_transpose(self):
         """Should transpose a sparse table"""
         obs = self.st1.transpose()
@@ -2415,6 +2892,26 @@ class SparseTableTests(TestCase):
         obs = self.st1.update_ids(id_map, axis='observation', inplace=True)
         npt.assert_equal(self.st1._observation_ids, np.array(['41', '42']))
 
+    def test_update_ids_retains_unmapped(self):
+        t = Table(np.array([[1, 2], [3, 4]]), ['o1', 'o2'],
+                  ['a_long_sample_id', 'b'])
+        obs = t.update_ids({'b': 'c'}, strict=False, inplace=False)
+        npt.assert_equal(obs.ids(), ['a_long_sample_id', 'c'])
+        self.assertEqual(obs.index('c', 'sample'), 1)
+
+        obs = t.update_ids({}, strict=False, inplace=False)
+        npt.assert_equal(obs.ids(), ['a_long_sample_id', 'b'])
+
+        with self.assertRaisesRegex(TableException, 'a_long_sample_id'):
+            t.update_ids({'b': 'c'}, inplace=False)
+
+    def test_update_ids_other_index(self):
+        t = self.st1.copy()
+        obs_index = t._obs_index
+        t.update_ids({'a': 'x', 'b': 'y'})
+        self.assertIs(t._obs_index, obs_index)
+        self.assertEqual(t._sample_index, {'x': 0, 'y': 1})
+
     def test_update_ids_nochange_bug(self):
         """ids are updated as expected"""
         # update observation ids
@@ -2466,6 +2963,30 @@ class SparseTableTests(TestCase):
         with self.assertRaises(UnknownAxisError):
             self.st1.sort_order(['b', 'a'], axis='foo')
 
+    def test_sort_order_metadata(self):
+        obs = self.st_rich.sort_order(['b', 'a'])
+        npt.assert_equal(obs.ids(), np.array(['b', 'a']))
+        self.assertEqual(obs.metadata(),
+                         self.st_rich.metadata()[::-1])
+        self.assertEqual(obs.metadata(axis='observation'),
+                         self.st_rich.metadata(axis='observation'))
+        self.assertEqual(obs.index('a', 'sample'), 1)
+        self.assertEqual(obs.index('2', 'observation'), 1)
+
+        # updating metadata does not alter the table it was sorted from
+        obs.add_metadata({'a': {'foo': 'bar'}})
+        obs.add_metadata({'1': {'foo': 'bar'}}, axis='observation')
+        self.assertEqual(obs.metadata('a')['foo'], 'bar')
+        self.assertEqual(obs.metadata('1', axis='observation')['foo'], 'bar')
+        self.assertIsNone(self.st_rich.metadata('a')['foo'])
+        self.assertIsNone(self.st_rich.metadata('1', 'observation')['foo'])
+
+    def test_sort_order_bad_ids(self):
+        with self.assertRaises(UnknownIDError):
+            self.st1.sort_order(['b', 'x'])
+        with self.assertRaises(TableException):
+            self.st1.sort_order(['b', 'b'])
+
     def test_sort(self):
         """table sorted by a function and provided axis"""
         # sort by samples by a function
@@ -2519,6 +3040,26 @@ class SparseTableTests(TestCase):
         obs = list(st.nonzero())
         self.assertEqual(obs, exp)
 
+    def test_nonzero_arrays(self):
+        data = {(0, 0): 5, (0, 1): 6, (0, 2): 0, (0, 3): 3,
+                (1, 0): 0, (1, 1): 7, (1, 2): 0, (1, 3): 8,
+                (2, 0): 1, (2, 1): -1, (2, 2): 0, (2, 3): 0}
+        st = Table(data, ['1', '2', '3'], ['a', 'b', 'c', 'd'])
+        for mat in (st._data.tocsr(), st._data.tocsc()):
+            st._data = mat
+            obs_ids, samp_ids, values = st.nonzero_arrays()
+            npt.assert_equal(obs_ids,
+                             np.array(['1', '1', '1', '2', '2', '3', '3']))
+            npt.assert_equal(samp_ids,
+                             np.array(['a', 'b', 'd', 'b', 'd', 'a', 'b']))
+            npt.assert_equal(values, np.array([5, 6, 3, 7, 8, 1, -1]))
+
+        st = Table(np.zeros((2, 2)), ['1', '2'], ['a', 'b'])
+        obs_ids, samp_ids, values = st.nonzero_arrays()
+        self.assertEqual(obs_ids.size, 0)
+        self.assertEqual(samp_ids.size, 0)
+        self.assertEqual(values.size, 0)
+
     def test_nonzero_csc_bug(self):
         data = {(0, 0): 5, (0, 1): 6, (0, 2): 0, (0, 3): 3,
                 (1, 0): 0, (1, 1): 7, (1, 2): 0, (1, 3): 8,
@@ -2663,6 +3204,48 @@ class SparseTableTests(TestCase):
         # test 12
         self.assertRaises(TableException, self.st1.merge, self.st4, u, i)
 
+    def test_merge_many_with_metadata(self):
+        t1 = Table(np.array([[1, 0], [2, 3]]), ['O1', 'O2'], ['S1', 'S2'],
+                   [{'tax': 'a'}, {'tax': 'b'}],
+                   [{'src': 1}, {'src': 1}])
+        t2 = Table(np.array([[4, 5], [6, 0]]), ['O3', 'O1'], ['S2', 'S3'],
+                   [{'tax': 'c'}, {'tax': 'x'}],
+                   [{'src': 2}, {'src': 2}])
+        t3 = Table(np.array([[7]]), ['O2'], ['S3'],
+                   [{'tax': 'y'}], [{'src': 3}])
+
+        calls = []
+
+        def md_f(x, y):
+            calls.append((x, y))
+            return {'src': x['src'] + y['src']}
+
+        obs = t1.merge([t2, t3], sample_metadata_f=md_f)
+        exp = Table(np.array([[1, 6, 0], [2, 3, 7], [0, 4, 5]]),
+                    ['O1', 'O2', 'O3'], ['S1', 'S2', 'S3'],
+                    [{'tax': 'a'}, {'tax': 'b'}, {'tax': 'c'}],
+                    [{'src': 1}, {'src': 3}, {'src': 5}])
+        self.assertEqual(obs, exp)
+
+        # only S2 (t1, t2) and S3 (t2, t3) are shared
+        self.assertEqual(len(calls), 2)
+
+    def test_merge_many_intersection(self):
+        t1 = Table(np.array([[1, 0], [2, 3]]), ['O1', 'O2'], ['S1', 'S2'],
+                   [{'tax': 'a'}, {'tax': 'b'}])
+        t2 = Table(np.array([[4, 5], [6, 0]]), ['O2', 'O1'], ['S2', 'S1'],
+                   [{'tax': 'c'}, {'tax': 'x'}])
+        t3 = Table(np.array([[7, 1]]), ['O2'], ['S2', 'S3'],
+                   [{'tax': 'y'}])
+
+        obs = t1.merge([t2, t3], sample='intersection',
+                       observation='intersection')
+        exp = Table(np.array([[14]]), ['O2'], ['S2'], [{'tax': 'b'}])
+        self.assertEqual(obs, exp)
+
+        with self.assertRaises(TableException):
+            t1.merge([t2, t3], sample='intersection', observation='foo')
+
     def test_data(self):
         """"""
         # Returns observations for a given sample
@@ -2818,6 +3401,81 @@ class SparseTableTests(TestCase):
         obs = list(self.st1.iter_pairwise(dense=True, tri=False, diag=False))
         npt.assert_equal(obs, exp)
 
+    def test_iter_pairwise_sparse(self):
+        """Should yield the sparse vectors"""
+        obs = list(self.st1.iter_pairwise(dense=False, axis='observation'))
+        self.assertEqual(len(obs), 1)
+        (v_i, id_i, md_i), (v_j, id_j, md_j) = obs[0]
+        self.assertEqual((id_i, id_j), ('1', '2'))
+        npt.assert_equal(v_i.toarray(), [[5, 6]])
+        npt.assert_equal(v_j.toarray(), [[7, 8]])
+
+    def test_pairwise(self):
+        data = scipy.sparse.random(40, 23, density=0.2, format='csr',
+                                   random_state=42)
+        data.data = np.ceil(data.data * 10)
+        data[:, 3] = 0
+        t = Table(data, ['o%d' % i for i in range(40)],
+                  ['s%d' % i for i in range(23)])
+        dense = data.toarray()
+
+        for metric in ('braycurtis', 'jaccard', 'cosine', 'euclidean'):
+            for axis, vectors in (('sample', dense.T), ('observation', dense)):
+                if metric == 'jaccard':
+                    vectors = vectors != 0
+                with np.errstate(invalid='ignore'):
+                    exp = pdist(vectors, metric)
+
+                for block_size in (5, 512):
+                    obs = t.pairwise(metric, axis, block_size=block_size)
+                    npt.assert_allclose(obs, exp, atol=1e-12)
+
+                    obs = t.pairwise(metric, axis, block_size=block_size,
+                                     form='square')
+                    exp_square = squareform(exp, checks=False)
+                    np.fill_diagonal(exp_square, 0)
+                    npt.assert_allclose(obs, exp_square, atol=1e-12)
+
+    def test_pairwise_euclidean_nearly_equal(self):
+        # the squared distance of these vectors is computed as -0.00049
+        data = np.array([[440377.15471578395, 954590.4936907372,
+                          499895.813687647, 425228.6248490755,
+                          620213.4520153778],
+                         [440377.1547157844, 954590.4936907382,
+                          499895.8136876476, 425228.624849076,
+                          620213.4520153785]]).T
+        t = Table(data, ['o%d' % i for i in range(5)], ['s1', 's2'])
+        obs = t.pairwise('euclidean')
+        self.assertFalse(np.isnan(obs).any())
+        npt.assert_allclose(obs, pdist(data.T), atol=1e-3)
+
+    def test_pairwise_out(self):
+        out = np.full(3, -1.)
+        obs = example_table.pairwise('cosine', out=out, block_size=2)
+        self.assertIs(obs, out)
+        npt.assert_allclose(out, pdist(example_table.matrix_data.T.toarray(),
+                                       'cosine'))
+
+        with self.assertRaises(ValueError):
+            example_table.pairwise(out=np.zeros((3, 3)))
+
+    def test_pairwise_n_jobs(self):
+        exp = example_table.pairwise('jaccard', axis='observation',
+                                     form='square')
+        obs = example_table.pairwise('jaccard', axis='observation',
+                                     form='square', n_jobs=2, block_size=1)
+        npt.assert_equal(obs, exp)
+
+    def test_pairwise_invalid(self):
+        with self.assertRaises(ValueError):
+            example_table.pairwise('foo')
+        with self.assertRaises(ValueError):
+            example_table.pairwise(form='foo')
+        with self.assertRaises(ValueError):
+            example_table.pairwise(n_jobs=0)
+        with self.assertRaises(UnknownAxisError):
+            example_table.pairwise(axis='foo')
+
     def test_iter(self):
         """Should iterate over samples"""
         exp = [(np.array([5, 7]), 'a', None), (np.array([6, 8]), 'b', None)]
@@ -2959,6 +3617,179 @@ class SparseTableTests(TestCase):
         self.st_rich._data *= 2
         self.assertNotEqual(copied_table, self.st_rich)
 
+    def test_copy_shares_lookups(self):
+        self.st_rich.index('a', 'sample')
+        self.st_rich._obs_index.positions(['1'])
+        copied_table = self.st_rich.copy()
+        self.assertIs(copied_table._sample_index._hash,
+                      self.st_rich._sample_index._hash)
+        self.assertIs(copied_table._obs_index._sorter,
+                      self.st_rich._obs_index._sorter)
+        self.assertIs(copied_table._sample_index._ids, copied_table.ids())
+        self.assertEqual(copied_table.index('b', 'sample'), 1)
+
+    def test_copy_nested_metadata(self):
+        self.st_rich._sample_metadata[0]['nested'] = {'a': [1]}
+        copied_table = self.st_rich.copy()
+        copied_table._sample_metadata[0]['nested']['a'].append(2)
+        copied_table._sample_metadata[0]['barcode'] += 'A'
+        self.assertEqual(self.st_rich.metadata('a')['nested'], {'a': [1]})
+        self.assertEqual(self.st_rich.metadata('a')['barcode'], 'aatt')
+
+    def test_copy_keeps_format(self):
+        self.st_rich._data = self.st_rich._data.tocsc()
+        copied_table = self.st_rich.copy()
+        copied_table._data[0, 0] = 42
+        self.assertEqual(self.st_rich._data.format, 'csc')
+        self.assertEqual(self.st_rich.get_value_by_ids('1', 'a'), 5)
+
+    def test_copy_independent_of_other_copies(self):
+        copied_table = self.st_rich.copy()
+        other = self.st_rich.copy()
+        other.transform(lambda v, i, md: v * 2, axis='observation')
+        self.assertEqual(copied_table, self.st_rich)
+        self.assertNotEqual(other, self.st_rich)
+
+    def test_init_dtype(self):
+        data = csr_matrix(np.array([[0, 5], [2, 0]], dtype=np.uint32))
+        obs = Table(data, ['a', 'b'], ['x', 'y'], dtype=None)
+        self.assertEqual(obs.dtype, np.uint32)
+        self.assertIsNot(obs.matrix_data, data)
+
+        obs = Table(np.array([[0, 5], [2, 0]]), ['a', 'b'], ['x', 'y'],
+                    dtype=np.float32)
+        self.assertEqual(obs.dtype, np.float32)
+
+        # the default remains float
+        obs = Table(data, ['a', 'b'], ['x', 'y'])
+        self.assertEqual(obs.dtype, np.float64)
+
+    def test_integer_operations(self):
+        data = np.array([[0, 5, 3], [2, 0, 0], [1, 1, 0]], dtype=np.uint32)
+        t = Table(data, ['a', 'b', 'c'], ['x', 'y', 'z'], dtype=None)
+
+        obs = t.filter(lambda v, i, md: v.sum() > 2, axis='observation',
+                       inplace=False)
+        self.assertEqual(obs.dtype, np.uint32)
+        npt.assert_equal(obs.matrix_data.toarray(), [[0, 5, 3]])
+
+        obs = t.filter(['x', 'z'], inplace=False)
+        self.assertEqual(obs.dtype, np.uint32)
+        npt.assert_equal(obs.matrix_data.toarray(), [[0, 3], [2, 0], [1, 0]])
+
+        obs = t.subsample(2, seed=42)
+        self.assertEqual(obs.dtype, np.uint32)
+        npt.assert_equal(obs.sum('sample'), [2, 2, 2])
+
+        # transformed values need not be integral
+        obs = t.norm(inplace=False)
+        self.assertEqual(obs.dtype, np.float64)
+        npt.assert_almost_equal(obs.sum('sample'), [1, 1, 1])
+
+    def test_narrow_dtypes_widened(self):
+        for dtype, exp in [(np.int8, np.int32), (np.int16, np.int32),
+                           (np.uint16, np.uint32), (np.float16, np.float32)]:
+            t = Table(np.array([[0, 5], [2, 4]], dtype=dtype), ['a', 'b'],
+                      ['x', 'y'], dtype=None)
+            self.assertEqual(t.dtype, exp)
+            obs = t.filter(lambda v, i, md: v.sum() > 5, axis='observation',
+                           inplace=False)
+            npt.assert_equal(obs.matrix_data.toarray(), [[2, 4]])
+            obs = t.subsample(2, seed=42)
+            npt.assert_equal(obs.sum('sample'), [2, 2])
+
+    def test_collapse_integer(self):
+        t = Table(np.array([[0, 5, 3], [2, 0, 1]], dtype=np.int32),
+                  ['a', 'b'], ['x', 'y', 'z'], dtype=None)
+
+        def bin_f(id_, md):
+            return 'g1' if id_ == 'x' else 'g2'
+
+        obs = t.collapse(bin_f, norm=False)
+        self.assertEqual(obs.dtype, np.int32)
+        npt.assert_equal(obs.matrix_data.toarray(), [[0, 8], [2, 1]])
+
+        obs = t.collapse(bin_f, norm=True)
+        self.assertEqual(obs.dtype, np.float64)
+        npt.assert_equal(obs.matrix_data.toarray(), [[0, 4], [2, 0.5]])
+
+    def test_to_json_integer_dtype(self):
+        t = Table(np.array([[0, 5], [2, 0]], dtype=np.int32), ['a', 'b'],
+                  ['x', 'y'], dtype=None)
+        obs = loads(t.to_json("testing"))
+        self.assertEqual(obs['matrix_element_type'], 'int')
+        npt.assert_equal(Table.from_json(obs).matrix_data.toarray(),
+                         [[0, 5], [2, 0]])
+
+    def test_kernels_int64_indices(self):
+        def matrix():
+            mat = csr_matrix(np.array([[0, 5, 3], [2, 0, 0], [1, 1, 0]],
+                                      dtype=np.float32))
+            mat.indices = mat.indices.astype(np.int64)
+            mat.indptr = mat.indptr.astype(np.int64)
+            return mat
+
+        index = _IDIndex(np.array(['a', 'b', 'c']))
+        mat, ids, md, keep = _filter(matrix(), np.array(['a', 'b', 'c']),
+                                     None, index, ['a', 'c'], 0, False)
+        self.assertEqual(mat.indices.dtype, np.int64)
+        npt.assert_equal(mat.toarray(), [[0, 5, 3], [1, 1, 0]])
+
+        mat, ids, md, keep = _filter(matrix(), np.array(['a', 'b', 'c']),
+                                     None, index, lambda v, i, m: v[0] > 0,
+                                     0, False)
+        npt.assert_equal(mat.toarray(), [[2, 0, 0], [1, 1, 0]])
+
+        mat = matrix()
+        _transform(mat, np.array(['a', 'b', 'c']), None,
+                   lambda v, i, m: v * 2, 0)
+        self.assertEqual(mat.dtype, np.float32)
+        npt.assert_equal(mat.toarray(), [[0, 10, 6], [4, 0, 0], [2, 2, 0]])
+
+    @pytest.mark.skipif(HAVE_H5PY is False, reason='H5PY is not installed')
+    def test_to_hdf5_dtype(self):
+        t = Table(np.array([[0, 5], [2, 0]], dtype=np.uint32), ['a', 'b'],
+                  ['x', 'y'], dtype=None)
+        with NamedTemporaryFile() as tmpfile:
+            with h5py.File(tmpfile.name, 'w') as h5:
+                t.to_hdf5(h5, 'tests')
+            with h5py.File(tmpfile.name, 'r') as h5:
+                self.assertEqual(h5['sample/matrix/data'].dtype, np.uint32)
+                self.assertEqual(h5['sample/matrix/indices'].dtype,
+                                 np.int32)
+                obs = Table.from_hdf5(h5)
+        self.assertEqual(obs.dtype, np.uint32)
+        self.assertEqual(obs, t)
+
+    def test_from_parts(self):
+        data = csr_matrix(np.array([[1., 0.], [2., 3.]]))
+        obs_ids = np.array(['1', '2'])
+        samp_ids = np.array(['a', 'b'])
+        samp_md = self.st_rich.metadata()
+        obs = Table._from_parts(data, obs_ids, samp_ids, None, samp_md,
+                                type='OTU table')
+        exp = Table(np.array([[1, 0], [2, 3]]), ['1', '2'], ['a', 'b'],
+                    None, [{'barcode': 'aatt'}, {'barcode': 'ttgg'}],
+                    type='OTU table')
+        self.assertEqual(obs, exp)
+        self.assertEqual(obs.index('b', 'sample'), 1)
+
+        # the parts are owned by the table, not copied
+        self.assertIs(obs.matrix_data, data)
+        self.assertIs(obs.ids(), samp_ids)
+        self.assertIs(obs.metadata(), samp_md)
+
+    def test_transpose_copies(self):
+        obs = self.st_rich.transpose()
+        obs._data.data[:] = 0
+        obs._sample_ids[0] = 'X'
+        obs._sample_metadata[0]['foo'] = 'bar'
+        self.assertEqual(self.st_rich.transpose().transpose(), self.st_rich)
+        npt.assert_equal(self.st_rich.ids(axis='observation'),
+                         np.array(['1', '2']))
+        self.assertIsNone(
+            self.st_rich.metadata(axis='observation')[0]['foo'])
+
     def test_filter_table_with_zeros(self):
         table = self.sparse_table
 
@@ -3007,6 +3838,44 @@ class SparseTableTests(TestCase):
         self.assertEqual(filtered_table_2._sample_index, {'b': 0})
         self.assertEqual(filtered_table_2._obs_index, {'2': 0, '3': 1})
 
+    def test_columnar_metadata_operations(self):
+        samp_md = [{'env': 'a'}, {'env': 'b'}, {'env': 'a'}]
+        obs_md = [{'taxonomy': ['k__x']}, {'taxonomy': ['k__y']}]
+        data = np.array([[1, 0, 2], [0, 3, 4]])
+        exp = Table(data, ['O1', 'O2'], ['S1', 'S2', 'S3'], obs_md, samp_md)
+        obs = Table(data, ['O1', 'O2'], ['S1', 'S2', 'S3'],
+                    ColumnarMetadata.from_rows(obs_md),
+                    ColumnarMetadata.from_rows(samp_md))
+        self.assertEqual(obs, exp)
+
+        filtered = obs.filter(['S3', 'S1'], inplace=False)
+        self.assertIsInstance(filtered.metadata(), ColumnarMetadata)
+        self.assertEqual(filtered, exp.filter(['S3', 'S1'], inplace=False))
+
+        order = ['S3', 'S1', 'S2']
+        self.assertIsInstance(obs.sort_order(order).metadata(),
+                              ColumnarMetadata)
+        self.assertEqual(obs.sort_order(order), exp.sort_order(order))
+
+        other = exp.update_ids({'S1': 'S4', 'S2': 'S5', 'S3': 'S6'},
+                               inplace=False)
+        concat = obs.concat([other])
+        self.assertIsInstance(concat.metadata(), ColumnarMetadata)
+        self.assertEqual(concat, exp.concat([other]))
+
+        copied = obs.copy()
+        copied.add_metadata({'S1': {'env': 'c'}})
+        self.assertEqual(copied.metadata('S1')['env'], 'c')
+        self.assertEqual(obs.metadata('S1')['env'], 'a')
+
+    def test_filter_shares_index(self):
+        filtered = self.st3.filter(['b'], inplace=False)
+        self.assertIs(filtered._obs_index, self.st3._obs_index)
+        self.assertEqual(filtered._sample_index, {'b': 0})
+
+        with self.assertRaises(KeyError):
+            self.st3.filter(['b', 'missing'], inplace=False)
+
     def test_filter_return_type(self):
         def f(vals, id_, md):
             return id_[0] == 'b'
@@ -3276,6 +4145,39 @@ class SparseTableTests(TestCase):
         self.assertEqual(new_counts.shape[0], 1)
         self.assertEqual(new_counts[0], 20)
 
+    def test_subsample_seed(self):
+        table = Table(np.array([[3, 1, 2], [0, 3, 4], [5, 0, 9]]),
+                      ['O1', 'O2', 'O3'], ['S1', 'S2', 'S3'])
+        for kwargs in ({}, {'with_replacement': True}, {'by_id': True}):
+            obs = table.subsample(3, seed=42, **kwargs)
+            exp = table.subsample(3, seed=42, **kwargs)
+            self.assertEqual(obs, exp)
+
+        obs = table.subsample(3, seed=np.random.default_rng(42))
+        exp = table.subsample(3, seed=42)
+        self.assertEqual(obs, exp)
+
+    def test_subsample_global_seed(self):
+        table = Table(np.array([[3, 1, 2], [0, 3, 4], [5, 0, 9]]),
+                      ['O1', 'O2', 'O3'], ['S1', 'S2', 'S3'])
+        np.random.seed(123)
+        exp = table.subsample(3)
+        np.random.seed(123)
+        obs = table.subsample(3)
+        self.assertEqual(obs, exp)
+
+    def test_subsample_deep(self):
+        # the population is far larger than what could be expanded in memory
+        table = Table(np.array([[4e9, 0], [6e9, 3], [1, 5]]),
+                      ['O1', 'O2', 'O3'], ['S1', 'S2'])
+        obs = table.subsample(1000, seed=1)
+        npt.assert_equal(obs.sum('sample'), np.array([1000.]))
+        self.assertEqual(list(obs.ids()), ['S1'])
+
+        obs = table.subsample(10 ** 6, seed=1)
+        npt.assert_allclose(obs.data('S1') / 10 ** 6, [0.4, 0.6],
+                            atol=0.01)
+
     def test_pa(self):
         exp = Table(np.array([[1, 1], [1, 0]]), ['5', '6'], ['a', 'b'])
         self.st7.pa()
@@ -3577,6 +4479,32 @@ class SparseTableTests(TestCase):
                 bin_f, norm=False, one_to_many=True, one_to_many_mode='foo',
                 axis='observation')
 
+    def test_collapse_one_to_many_repeated_partition(self):
+        table = Table(np.array([[1, 2, 0], [4, 0, 6]]), ['1', '2'],
+                      ['a', 'b', 'c'],
+                      [{'pathways': [['x', 'p'], ['y', 'p'], ['x', 'q']]},
+                       {'pathways': [['x', 'q']]}])
+
+        def bin_f(id_, md):
+            for path in md['pathways']:
+                yield (path, path[1])
+
+        obs = table.collapse(bin_f, norm=False, one_to_many=True,
+                             axis='observation')
+        exp = Table(np.array([[2, 4, 0], [5, 2, 6]]), ['p', 'q'],
+                    ['a', 'b', 'c'],
+                    [{'Path': ['y', 'p']}, {'Path': ['x', 'q']}])
+        self.assertEqual(obs, exp)
+
+        obs = table.collapse(bin_f, norm=False, one_to_many=True,
+                             one_to_many_mode='divide', axis='observation')
+        exp = Table(np.array([[2 / 3., 4 / 3., 0], [4 + 1 / 3., 2 / 3., 6]]),
+                    ['p', 'q'], ['a', 'b', 'c'],
+                    [{'Path': ['y', 'p']}, {'Path': ['x', 'q']}])
+        npt.assert_almost_equal(obs.matrix_data.toarray(),
+                                exp.matrix_data.toarray())
+        npt.assert_equal(obs.ids(axis='observation'), np.array(['p', 'q']))
+
     def test_collapse_median(self):
         table = Table(
             np.array([[5, 6, 7],
@@ -3604,6 +4532,35 @@ class SparseTableTests(TestCase):
                      {'collapsed_ids': ['b', 'd', 'f']}])
         self.assertEqual(obs, exp)
 
+    def test_collapse_sum_matches_collapse_f(self):
+        table = Table(np.array([[5, 0, 7, 1],
+                                [1, 2, 0, 0],
+                                [0, 0, 0, 0],
+                                [11, 12, 13, 4]]),
+                      ['a', 'b', 'c', 'd'], ['s1', 's2', 's3', 's4'],
+                      [{'g': 'x'}, {'g': 'y'}, {'g': 'x'}, {'g': 'x'}],
+                      [{'g': 'p'}, {'g': 'r'}, {'g': 'p'}, {'g': 'p'}])
+
+        def partition_f(id_, md):
+            return md['g']
+
+        def collapse_f(t, axis):
+            return t.sum(axis)
+
+        for axis in ('sample', 'observation'):
+            for norm in (True, False):
+                for min_group_size in (1, 2, 3):
+                    kwargs = {'norm': norm, 'axis': axis,
+                              'min_group_size': min_group_size}
+                    obs = table.collapse(partition_f, **kwargs)
+                    exp = table.collapse(partition_f, collapse_f, **kwargs)
+                    self.assertEqual(obs, exp)
+
+        obs = table.collapse(partition_f, norm=False, axis='sample')
+        npt.assert_equal(obs.ids(), np.array(['p', 'r']))
+        self.assertEqual(obs.metadata(axis='sample')[0]['collapsed_ids'],
+                         ['s1', 's3', 's4'])
+
     def test_collapse_observations_by_metadata(self):
         """Collapse observations by arbitrary metadata"""
         dt_rich = Table(
@@ -17,11 +17,13 @@ import numpy.testing as npt
 import pytest
 
 from biom.table import Table
+from biom.exception import UnknownAxisError
 from biom.parse import parse_biom_table, load_table
 from biom.util import (natsort, flatten, unzip, HAVE_H5PY,
                        get_biom_project_dir, parse_biom_config_files,
                        compute_counts_per_sample_stats, safe_md5, biom_open,
-                       get_data_path, generate_subsamples, is_hdf5_file)
+                       get_data_path, generate_subsamples, is_hdf5_file,
+                       generate_rarefactions)
 
 np.random.seed(1234)
 
@@ -59,6 +61,64 @@ class UtilTests(TestCase):
         self.assertEqual(actual_o2, {(0, 3, 3), (0, 2, 3), (0, 3, 2),
                                      (0, 2, 2)})
 
+    def test_generate_rarefactions(self):
+        table = Table(np.array([[3, 1, 1], [0, 3, 3]]), ['O1', 'O2'],
+                      ['S1', 'S2', 'S3'])
+        obs = list(generate_rarefactions(table, [3, 4], 50, seed=42))
+        self.assertEqual([(d, i) for d, i, _ in obs],
+                         [(d, i) for d in (3, 4) for i in range(50)])
+
+        actual_o2 = set()
+        for depth, _, mat in obs:
+            self.assertEqual(mat.shape, (2, 3))
+            sums = np.asarray(mat.sum(axis=0)).ravel()
+            if depth == 3:
+                npt.assert_equal(sums, [3, 3, 3])
+                actual_o2.add(tuple(mat.toarray()[1]))
+            else:
+                # S1 cannot be rarefied to 4
+                npt.assert_equal(sums, [0, 4, 4])
+        self.assertEqual(actual_o2, {(0, 3, 3), (0, 2, 3), (0, 3, 2),
+                                     (0, 2, 2)})
+
+    def test_generate_rarefactions_seed(self):
+        table = Table(np.array([[3, 1, 5], [2, 3, 3], [9, 0, 1]]),
+                      ['O1', 'O2', 'O3'], ['S1', 'S2', 'S3'])
+        exp = list(generate_rarefactions(table, [2, 4], 5, seed=42))
+        obs = list(generate_rarefactions(table, [2, 4], 5, seed=42,
+                                         n_jobs=2))
+        self.assertEqual(len(obs), len(exp))
+        for (o_d, o_i, o_mat), (e_d, e_i, e_mat) in zip(obs, exp):
+            self.assertEqual((o_d, o_i), (e_d, e_i))
+            npt.assert_equal(o_mat.toarray(), e_mat.toarray())
+
+        # each rarefaction has its own stream
+        self.assertGreater(len({tuple(m.toarray().ravel())
+                                for _, _, m in exp}), 2)
+
+    def test_generate_rarefactions_observation(self):
+        table = Table(np.array([[3, 1, 1], [0, 3, 3]]), ['O1', 'O2'],
+                      ['S1', 'S2', 'S3'])
+        for _, _, mat in generate_rarefactions(table, 5, 3, seed=1,
+                                               axis='observation',
+                                               with_replacement=True):
+            npt.assert_equal(np.asarray(mat.sum(axis=1)).ravel(), [5, 5])
+
+        with self.assertRaises(UnknownAxisError):
+            next(generate_rarefactions(table, 5, 3, axis='foo'))
+
+    def test_generate_rarefactions_interleaved(self):
+        small = Table(np.array([[3, 1]]), ['O1'], ['S1', 'S2'])
+        large = Table(np.array([[3, 1, 1], [0, 3, 3]]), ['O1', 'O2'],
+                      ['S1', 'S2', 'S3'])
+        gen_small = generate_rarefactions(small, np.int64(1), 3, seed=1)
+        gen_large = generate_rarefactions(large, np.int64(1), 3, seed=1)
+        for (_, _, m_small), (_, _, m_large) in zip(gen_small, gen_large):
+            self.assertEqual(m_small.shape, (1, 2))
+            self.assertEqual(m_large.shape, (2, 3))
+            npt.assert_equal(np.asarray(m_large.sum(axis=0)).ravel(),
+                             [1, 1, 1])
+
     def test_natsort(self):
         """natsort should perform numeric comparisons on strings
 
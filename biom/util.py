@@ -20,6 +20,12 @@ from os.path import abspath, dirname, exists
 import re
 from hashlib import md5
 from gzip import open as gzip_open
+from multiprocessing import Pool
+
+import numpy as np
+from scipy.sparse import csc_matrix, csr_matrix
+
+from biom.exception import UnknownAxisError
 
 try:
     import h5py
@@ -86,6 +92,145 @@ def generate_subsamples(table, n, axis='sample', by_id=False):
         yield table.subsample(n, axis, by_id)
 
 
+# the source matrix of a rarefaction, set per worker process by
+# _rarefaction_init so the arrays are not sent with every task. Rarefactions
+# in the calling process pass their source explicitly instead.
+_rarefaction_source = None
+
+
+def _rarefaction_init(mat, with_replacement):
+    """Stash the source matrix in a rarefaction worker"""
+    global _rarefaction_source
+    _rarefaction_source = (mat, with_replacement)
+
+
+def _rarefaction_task(task, source=None):
+    """Rarefy the source matrix once
+
+    The source is the ``(mat, with_replacement)`` stashed in the worker, or
+    `source` if given.
+
+    Returns the rarefied values with zeros removed, the mask of the retained
+    positions in the source matrix, and the resulting indptr.
+    """
+    from biom._subsample import _subsample
+
+    depth, seed_seq = task
+    mat, with_replacement = _rarefaction_source if source is None \
+        else source
+
+    # only the values are copied, the kernel never modifies the structure
+    vectors = mat.__class__((mat.data.copy(), mat.indices, mat.indptr),
+                            shape=mat.shape, copy=False)
+    _subsample(vectors, depth, with_replacement,
+               np.random.default_rng(seed_seq))
+
+    keep = vectors.data != 0
+    nnz = np.zeros(len(keep) + 1, dtype=np.int64)
+    np.cumsum(keep, out=nnz[1:])
+    return vectors.data[keep], keep, nnz[mat.indptr]
+
+
+def generate_rarefactions(table, depths, iterations, axis='sample',
+                          with_replacement=False, seed=None, n_jobs=1):
+    """Generate many rarefactions of a table at many depths
+
+    Parameters
+    ----------
+    table : Table
+        The table to rarefy
+    depths : int or iterable of int
+        The depths to rarefy to
+    iterations : int
+        The number of rarefactions to perform per depth
+    axis : {'sample', 'observation'}, optional
+        The axis to operate on, defaults to 'sample'.
+    with_replacement : bool, optional
+        If `True`, draw with replacement. Defaults to `False`.
+    seed : int or numpy.random.SeedSequence, optional
+        The root seed. Every rarefaction draws from its own independent
+        stream spawned from this seed, so results do not depend on
+        `n_jobs`.
+    n_jobs : int, optional
+        The number of processes to use. Defaults to 1, which rarefies in the
+        calling process.
+
+    Returns
+    -------
+    GeneratorType
+        Yields ``(depth, iteration, matrix)`` in depth then iteration order.
+        ``matrix`` is a scipy.sparse matrix of the same shape as `table`,
+        whose rows and columns follow ``table.ids(axis='observation')`` and
+        ``table.ids()``. Vectors whose sum is below the depth are entirely
+        zero.
+
+    Notes
+    -----
+    The matrix is handed to each worker once when the pool starts, and with
+    the fork start method its arrays are shared rather than copied. Workers
+    only copy the values they rarefy, and only the rarefied values are sent
+    back.
+
+    Examples
+    --------
+    Rarefy the example table to a depth of 3, 10 times, stacking the results
+    into an (iterations, observations, samples) array:
+
+    >>> import numpy as np
+    >>> from biom import example_table
+    >>> gen = generate_rarefactions(example_table, [3], 10, seed=42)
+    >>> stacked = np.stack([mat.toarray() for _, _, mat in gen])
+    >>> stacked.shape
+    (10, 2, 3)
+    >>> print(stacked.sum(axis=1)[0])
+    [ 3.  3.  3.]
+
+    """
+    if isinstance(depths, (int, np.integer)):
+        depths = [depths]
+    depths = list(depths)
+
+    if min(depths + [iterations]) < 0:
+        raise ValueError("depths and iterations cannot be negative.")
+
+    if n_jobs < 1:
+        raise ValueError("n_jobs must be at least 1.")
+
+    if axis == 'sample':
+        mat = csc_matrix(table.matrix_data, copy=True)
+    elif axis == 'observation':
+        mat = csr_matrix(table.matrix_data, copy=True)
+    else:
+        raise UnknownAxisError(axis)
+
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    streams = iter(seed.spawn(len(depths) * iterations))
+    tasks = [(depth, next(streams)) for depth in depths
+             for _ in range(iterations)]
+
+    if n_jobs == 1:
+        results = map(functools.partial(_rarefaction_task,
+                                        source=(mat, with_replacement)),
+                      tasks)
+        pool = None
+    else:
+        pool = Pool(n_jobs, initializer=_rarefaction_init,
+                    initargs=(mat, with_replacement))
+        chunksize = len(tasks) // (4 * n_jobs) or 1
+        results = pool.imap(_rarefaction_task, tasks, chunksize=chunksize)
+
+    try:
+        for idx, (data, keep, indptr) in enumerate(results):
+            depth = tasks[idx][0]
+            yield (depth, idx % iterations,
+                   mat.__class__((data, mat.indices[keep], indptr),
+                                 shape=mat.shape))
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
 def get_biom_format_version_string(version=None):
     """Returns the current Biom file format version.
 
@@ -317,13 +462,13 @@ def compute_counts_per_sample_stats(table, binary_counts=False):
     permission from the authors of this function to port it to the BIOM Format
     project (and keep it under BIOM's BSD license).
     """
-    sample_counts = {}
-    for count_vector, sample_id, metadata in table.iter():
-        if binary_counts:
-            sample_counts[sample_id] = (count_vector != 0).sum()
-        else:
-            sample_counts[sample_id] = float(count_vector.sum())
-    counts = list(sample_counts.values())
+    # the counts are gathered from the sparse matrix, without densifying
+    # each sample
+    if binary_counts:
+        counts = table.nonzero_counts('sample', binary=True)
+    else:
+        counts = table.sum(axis='sample').astype(float)
+    sample_counts = dict(zip(table.ids(), counts.tolist()))
 
     if len(counts) == 0:
         return (0, 0, 0, 0, sample_counts)
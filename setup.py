@@ -108,12 +108,15 @@ extensions = [Extension("biom._filter",
                         include_dirs=[np.get_include()]),
               Extension("biom._subsample",
                         ["biom/_subsample" + ext],
+                        include_dirs=[np.get_include()]),
+              Extension("biom._pairwise",
+                        ["biom/_pairwise" + ext],
                         include_dirs=[np.get_include()])]
 extensions = cythonize(extensions)
 
 install_requires = [
     "click",
-    "numpy >= 1.9.2",
+    "numpy >= 1.18",
     "scipy >= 1.3.1",
     'pandas >= 0.20.0',
     "cython >= 0.29",